@@ -0,0 +1,77 @@
+import base64
+import pickle
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache.backends import db
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db import DatabaseError, connections, router, transaction
+from django.utils import timezone
+
+# Keys written per statement, within SQLite's limit on query parameters.
+CHUNK_SIZE = 300
+
+class DatabaseCache(db.DatabaseCache):
+    """
+    Database cache which writes many keys in a single transaction. Django's
+    set_many sets each key on its own, with a transaction and a COUNT(*) of
+    the table per key; here the table size is checked once, and the keys
+    are replaced with one DELETE and one INSERT.
+    """
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        """
+        Set many values at once.
+
+        Parameters:
+            data (dictionary): Values keyed by cache key
+            timeout (int): Seconds until the values expire
+            version (int): Key version, the cache's default if not given
+
+        Returns:
+            list: Keys which could not be set
+        """
+        if not data:
+            return []
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is None:
+            expires = datetime.max
+        elif settings.USE_TZ:
+            expires = datetime.utcfromtimestamp(timeout)
+        else:
+            expires = datetime.fromtimestamp(timeout)
+        alias = router.db_for_write(self.cache_model_class)
+        connection = connections[alias]
+        expires = connection.ops.adapt_datetimefield_value(
+            expires.replace(microsecond=0)
+        )
+
+        rows = []
+        for key, value in data.items():
+            key = self.make_key(key, version=version)
+            self.validate_key(key)
+            pickled = pickle.dumps(value, self.pickle_protocol)
+            rows.append(
+                (key, base64.b64encode(pickled).decode('latin1'), expires)
+            )
+
+        table = connection.ops.quote_name(self._table)
+        try:
+            with transaction.atomic(using=alias), \
+                    connection.cursor() as cursor:
+                cursor.execute('SELECT COUNT(*) FROM %s' % table)
+                if cursor.fetchone()[0] > self._max_entries:
+                    now = timezone.now().replace(microsecond=0)
+                    self._cull(alias, cursor, now)
+                for start in range(0, len(rows), CHUNK_SIZE):
+                    chunk = rows[start:start+CHUNK_SIZE]
+                    cursor.execute('DELETE FROM %s WHERE cache_key IN (%s)' % (
+                        table, ', '.join(['%s'] * len(chunk))
+                    ), [key for key, _, _ in chunk])
+                    cursor.executemany(
+                        'INSERT INTO %s (cache_key, value, expires) '
+                        'VALUES (%%s, %%s, %%s)' % table, chunk
+                    )
+        except DatabaseError:
+            # Like a failed set, another writer got there first.
+            return list(data)
+        return []
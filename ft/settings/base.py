@@ -10,7 +10,7 @@ INSTALLED_APPS = [
     'home',
     'users',
     'products',
-    'search',
+    'search.apps.SearchConfig',
     'pricing',
     'contact',
 
@@ -91,6 +91,40 @@ DATABASES = {
     }
 }
 
+# Cache, shared by the web workers and the scraper so the scraper can
+# invalidate what the site has cached. Create with createcachetable.
+CACHES = {
+    'default': {
+        'BACKEND': 'ft.cache.DatabaseCache',
+        'LOCATION': 'cache',
+        # A card per product, so the default of 300 would cull constantly.
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    # Rendered pages, most of them left behind by expired versions within
+    # minutes, so a small table which is culled often.
+    'pages': {
+        'BACKEND': 'ft.cache.DatabaseCache',
+        'LOCATION': 'page_cache',
+        'OPTIONS': {'MAX_ENTRIES': 2000},
+    },
+}
+
+# Logging, printing the scraper's JSON events to stderr
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'pricing.scraper': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 # Static files (CSS, JavaScript, Images)
 STATICFILES_DIRS = [os.path.join(PROJECT_DIR, 'static')]
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
@@ -114,5 +148,8 @@ ACCOUNT_EMAIL_REQUIRED = True
 ACCOUNT_AUTHENTICATION_METHOD = 'username_email'
 ACCOUNT_LOGIN_ON_EMAIL_CONFIRMATION = True
 
+# Amazon Product Advertising API
+AMAZON_API_URL = 'https://webservices.amazon.com/onca/xml'
+
 # emails
 EMAIL_BACKEND = 'sendgrid_backend.SendgridBackend'
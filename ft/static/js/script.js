@@ -12,6 +12,26 @@ $(function() {
     }
   });
 
+  // search suggestions
+  var suggestions = $('#query-suggestions');
+  var suggested;
+  $(query).on('input', function () {
+    var text = $(this).val().trim();
+    if (text.length < 2 || text === suggested) {
+      return;
+    }
+    suggested = text;
+    $.getJSON(suggestions.data('url'), {query: text}, function (data) {
+      if (text !== suggested) {
+        return;
+      }
+      suggestions.empty();
+      $.each(data.suggestions, function (i, suggestion) {
+        suggestions.append($('<option>').val(suggestion.label));
+      });
+    });
+  });
+
   // menu dropdown
   $('#head-arrow img').click(function() {
     if (!$(this).hasClass('flip')) {
@@ -5,7 +5,7 @@ from django.views.generic import TemplateView
 
 from home.views import home
 
-from search.views import search
+from search.views import search, suggest
 
 from contact.views import contact, contact_success
 
@@ -15,6 +15,7 @@ urlpatterns = [
     url(r'^admin/', admin.site.urls),
 
     url(r'^search/$', search, name='search'),
+    url(r'^search/suggest/$', suggest, name='suggest'),
 
     url(r'', include('products.urls')),
 
@@ -5,3 +5,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ft.settings.prod")
 
 application = get_wsgi_application()
+
+# Build the search suggestions before the first request needs them.
+from search.suggest import suggestions
+suggestions.build()
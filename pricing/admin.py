@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Listing, Price
+from .models import Listing, Price, ScrapeRun
 
 class ListingInline(admin.TabularInline):
     model = Listing
@@ -17,7 +17,10 @@ class PriceInline(admin.TabularInline):
 
 class ListingAdmin(admin.ModelAdmin):
     model = Listing
-    exclude = ('variant', 'retailer', 'condition', 'new', 'time')
+    exclude = (
+        'variant', 'retailer', 'condition', 'new', 'time', 'next_fetch',
+        'failures', 'fingerprint', 'lease_owner', 'lease_expires'
+    )
     readonly_fields = ('url',)
     inlines = [PriceInline]
     search_fields = (
@@ -26,3 +29,19 @@ class ListingAdmin(admin.ModelAdmin):
     )
 
 admin.site.register(Listing, ListingAdmin)
+
+class ScrapeRunAdmin(admin.ModelAdmin):
+    model = ScrapeRun
+    list_display = (
+        'started', 'retailers', 'owner', 'listings', 'requests',
+        'prices_inserted', 'prices_extended', 'listings_failed'
+    )
+    list_filter = ('retailers',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+admin.site.register(ScrapeRun, ScrapeRunAdmin)
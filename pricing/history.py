@@ -0,0 +1,158 @@
+from datetime import datetime, time
+from itertools import groupby
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from pricing.scraper.retailers import RETAILERS
+
+from .models import Price
+
+CONDITIONS = ('new', 'refurb', 'used')
+OPACITIES = {'new': 1, 'refurb': .67, 'used': .33}
+DEFAULT_POINTS = 300
+MIN_POINTS = 10
+MAX_POINTS = 2000
+
+def parse_time(value):
+    """
+    Read a time range bound given as an ISO 8601 date or date and time.
+    Dates stand for their midnight, and times without a zone for UTC.
+
+    Parameters:
+        value (string): Bound to parse, or None
+
+    Returns:
+        datetime: The bound, or None if no value was given
+
+    Raises:
+        ValueError: If the value is not a valid date or time
+    """
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError('Invalid date or time: %s' % value)
+        parsed = datetime.combine(day, time())
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, timezone.utc)
+    return parsed
+
+def drop_repeats(points):
+    """
+    Drop points which repeat the value before them, as a stepped line is
+    drawn the same without them. The last point is kept so the line still
+    reaches it.
+
+    Parameters:
+        points (list): (time, value) tuples in time order
+
+    Returns:
+        list: Points where the value changes
+    """
+    kept = []
+    for point in points:
+        if not kept or point[1] != kept[-1][1]:
+            kept.append(point)
+    if points and kept[-1] is not points[-1]:
+        kept.append(points[-1])
+    return kept
+
+def largest_triangles(points, budget):
+    """
+    Downsample points with Largest-Triangle-Three-Buckets: the points
+    between the first and last are split into budget - 2 buckets, and each
+    bucket keeps the point forming the largest triangle with the point kept
+    before it and the average of the next bucket, which preserves the peaks
+    and dips of the line. A bucket holding a missing value keeps it, so
+    gaps in the line survive.
+
+    Parameters:
+        points (list): (time, value) tuples in time order, value may be None
+        budget (int): Most points to keep
+
+    Returns:
+        list: Kept points
+    """
+    if len(points) <= budget or budget < 3:
+        return points
+    size = (len(points) - 2) / (budget - 2)
+    kept = [points[0]]
+    for bucket in range(budget - 2):
+        start = int(bucket * size) + 1
+        end = int((bucket + 1) * size) + 1
+        candidates = points[start:end]
+        gap = next((point for point in candidates if point[1] is None), None)
+        if gap is not None:
+            kept.append(gap)
+            continue
+
+        following = [
+            point for point in points[end:int((bucket + 2) * size) + 1]
+            if point[1] is not None
+        ] or [point for point in points[-1:] if point[1] is not None]
+        previous_time, previous_value = kept[-1]
+        if following:
+            average_time = sum(point[0] for point in following)/len(following)
+            average_value = sum(point[1] for point in following)/len(following)
+        else:
+            average_time, average_value = points[-1][0], previous_value
+        if previous_value is None:
+            previous_value = average_value
+
+        def area(point):
+            return abs(
+                (previous_time - average_time) * (point[1] - previous_value) -
+                (previous_time - point[0]) * (average_value - previous_value)
+            )
+        kept.append(max(candidates, key=area))
+    kept.append(points[-1])
+    return kept
+
+def price_history(variant, start=None, end=None, budget=DEFAULT_POINTS):
+    """
+    Build the price history chart of a variant, with a stepped line per
+    retailer and condition, from a single query. Each line keeps at most
+    budget points.
+
+    Parameters:
+        variant (Variant Object): Variant to chart
+        start (datetime): Earliest price to include, or None
+        end (datetime): Latest price to include, or None
+        budget (int): Most points per line
+
+    Returns:
+        list: Chart.js datasets
+    """
+    prices = Price.objects.filter(listing__variant=variant)
+    if start:
+        prices = prices.filter(time__gte=start)
+    if end:
+        prices = prices.filter(time__lte=end)
+    rows = prices.order_by(
+        'listing__retailer', 'condition', 'time'
+    ).values_list('listing__retailer', 'condition', 'time', 'total')
+    series = {
+        key: [
+            (int(seen.timestamp() * 1000),
+             float(total) if total is not None else None)
+            for _, _, seen, total in group
+        ] for key, group in groupby(rows, key=lambda row: row[:2])
+    }
+
+    datasets = []
+    for retailer in RETAILERS.values():
+        for condition in CONDITIONS:
+            color = 'rgba(%s, %s)' % (retailer.color, OPACITIES[condition])
+            points = largest_triangles(drop_repeats(
+                series.get((retailer.name, condition), [])
+            ), budget)
+            datasets.append({
+                'label': '%s (%s)' % (retailer.label, condition),
+                'data': [{'x': x, 'y': y} for x, y in points],
+                'borderColor': color, 'backgroundColor': color,
+                'fill': False, 'steppedLine': True
+            })
+    return datasets
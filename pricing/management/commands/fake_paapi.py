@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from pricing.scraper.fake import FakeItemLookupServer
+
+class Command(BaseCommand):
+    help = 'Serve a local fake of the Product Advertising API ItemLookup.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8001)
+        parser.add_argument(
+            '--latency', type=float, default=0,
+            help='seconds to wait before answering each request'
+        )
+        parser.add_argument(
+            '--throttle-rate', type=float,
+            help='requests per second allowed before throttling'
+        )
+        parser.add_argument(
+            '--change-rate', type=float, default=0.1,
+            help='chance that an item\'s price moves between lookups'
+        )
+
+    def handle(self, *args, **options):
+        server = FakeItemLookupServer(
+            (options['host'], options['port']), latency=options['latency'],
+            rate=options['throttle_rate'], change_rate=options['change_rate'],
+            verbose=options['verbosity'] > 1
+        )
+        self.stdout.write(
+            'Serving ItemLookup at %s; set AMAZON_API_URL to use it.'
+            % server.url
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
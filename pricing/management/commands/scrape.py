@@ -0,0 +1,94 @@
+import signal
+import logging
+import threading
+
+from django.core.management.base import BaseCommand
+
+from pricing.scraper.pipeline import RetailerPool, Scheduler
+from pricing.scraper.retailers import RETAILERS
+from pricing.scraper.session import CONNECT_TIMEOUT, READ_TIMEOUT
+
+class Command(BaseCommand):
+    help = 'Continuously refresh the prices of listings which are due.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retailer', action='append', choices=sorted(RETAILERS),
+            help='retailer whose listings are refreshed, may be repeated; '
+            'every retailer by default'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=60,
+            help='listings claimed per cycle and retailer'
+        )
+        parser.add_argument(
+            '--rate', type=float,
+            help='API requests per second to start at, overriding each '
+            'retailer\'s default'
+        )
+        parser.add_argument(
+            '--max-rate', type=float,
+            help='API requests per second the rate may climb back to, the '
+            'starting rate by default'
+        )
+        parser.add_argument(
+            '--concurrency', type=int,
+            help='number of concurrent fetch workers per retailer, '
+            'overriding each retailer\'s default'
+        )
+        parser.add_argument(
+            '--connect-timeout', type=float, default=CONNECT_TIMEOUT,
+            help='seconds to wait for a connection to an API'
+        )
+        parser.add_argument(
+            '--read-timeout', type=float, default=READ_TIMEOUT,
+            help='seconds to wait for data from an API'
+        )
+        parser.add_argument(
+            '--idle', type=float, default=60,
+            help='seconds to wait when no listings are due'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='refresh a single batch per retailer and exit'
+        )
+        parser.add_argument(
+            '--no-warm', action='store_true',
+            help='do not render changed pages into the page cache after '
+            'expiring them'
+        )
+
+    def handle(self, *args, **options):
+        # Batch and run events are logged at INFO, each listing at DEBUG.
+        logging.getLogger('pricing.scraper').setLevel({
+            0: logging.WARNING, 1: logging.INFO
+        }.get(options['verbosity'], logging.DEBUG))
+        stop = threading.Event()
+
+        def shutdown(signum, frame):
+            self.stdout.write('Finishing the current batches before exiting.')
+            stop.set()
+
+        signal.signal(signal.SIGINT, shutdown)
+        signal.signal(signal.SIGTERM, shutdown)
+
+        # Each retailer gets its own workers, session, rate limiter and
+        # circuit breaker, which last for the whole run so connections are
+        # kept warm and the request rate and API health carry over.
+        pools = [
+            RetailerPool(
+                RETAILERS[name], options['rate'], options['max_rate'],
+                options['concurrency'], options['connect_timeout'],
+                options['read_timeout']
+            ) for name in options['retailer'] or sorted(RETAILERS)
+        ]
+        scheduler = Scheduler(
+            pools, options['batch_size'], options['idle'],
+            warm=not options['no_warm']
+        )
+        try:
+            refreshed = scheduler.run(stop, options['once'])
+        finally:
+            for pool in pools:
+                pool.close()
+        self.stdout.write('Refreshed %d listings.' % refreshed)
@@ -0,0 +1,139 @@
+import os
+import time
+import logging
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+
+from pricing.models import Listing, ScrapeRun
+from pricing.scraper.amazon import Amazon
+from pricing.scraper.fake import FakeItemLookupServer
+from pricing.scraper.pipeline import RetailerPool, Scheduler
+from products.models import Category, Manufacturer, Product, Variant
+
+def create_listings(count):
+    """
+    Fill the database with synthetic products, each with one variant and one
+    Amazon listing.
+
+    Parameters:
+        count (int): Number of listings to create
+    """
+    category = Category.objects.create(name='Benchmark')
+    manufacturer = Manufacturer.objects.create(name='Acme')
+    products = Product.objects.bulk_create([
+        Product(
+            category=category, manufacturer=manufacturer,
+            name='Item %d' % i, slug='acme-item-%d' % i
+        ) for i in range(count)
+    ])
+    if not products[0].pk:
+        products = Product.objects.order_by('pk')
+    variants = Variant.objects.bulk_create([
+        Variant(product=product, name='Base', slug='base')
+        for product in products
+    ])
+    if not variants[0].pk:
+        variants = Variant.objects.order_by('pk')
+    Listing.objects.bulk_create([
+        Listing(
+            variant=variant, retailer='amazon', identifier='B%09d' % i,
+            url=Amazon().listing_url('B%09d' % i)
+        ) for i, variant in enumerate(variants)
+    ])
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the scraper against a local fake of the Product '
+        'Advertising API, using a throwaway test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--listings', type=int, default=2000)
+        parser.add_argument(
+            '--passes', type=int, default=2,
+            help='times every listing is refreshed'
+        )
+        parser.add_argument(
+            '--latency', type=float, default=0.05,
+            help='seconds the fake API waits before answering'
+        )
+        parser.add_argument(
+            '--throttle-rate', type=float,
+            help='requests per second the fake API allows'
+        )
+        parser.add_argument(
+            '--change-rate', type=float, default=0.1,
+            help='chance that an item\'s price moves between lookups'
+        )
+        parser.add_argument('--rate', type=float, default=50)
+        parser.add_argument('--concurrency', type=int, default=4)
+
+    def handle(self, *args, **options):
+        # The summary below replaces the per-batch events.
+        if options['verbosity'] < 2:
+            logging.getLogger('pricing.scraper').setLevel(logging.WARNING)
+        for key in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY',
+                    'AMAZON_ASSOCIATE_TAG'):
+            os.environ.setdefault(key, 'benchmark')
+
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True
+        )
+        server = FakeItemLookupServer(
+            latency=options['latency'], rate=options['throttle_rate'],
+            change_rate=options['change_rate']
+        )
+        server.start()
+        try:
+            create_listings(options['listings'])
+            with override_settings(AMAZON_API_URL=server.url):
+                self.benchmark(server, options)
+        finally:
+            server.shutdown()
+            server.server_close()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def benchmark(self, server, options):
+        pool = RetailerPool(
+            Amazon(), options['rate'], concurrency=options['concurrency']
+        )
+        scheduler = Scheduler([pool], limit=None)
+        refreshed = 0
+        start = time.perf_counter()
+        for _ in range(options['passes']):
+            Listing.objects.update(next_fetch=None)
+            refreshed += scheduler.run(once=True)
+        elapsed = time.perf_counter() - start
+        pool.close()
+
+        self.stdout.write('Listings refreshed: %d' % refreshed)
+        self.stdout.write('Wall time: %.2fs' % elapsed)
+        self.stdout.write('Listings/sec: %.1f' % (refreshed / elapsed))
+        self.stdout.write('API requests: %d (%d throttled)' % (
+            server.requests, server.throttles
+        ))
+        runs = ScrapeRun.objects.order_by('started')
+        for number, run in enumerate(runs, 1):
+            self.stdout.write(
+                'Pass %d: %d listings in %.2fs, %d prices inserted, %d '
+                'extended, %d unchanged, %.1f KB fetched, %.2f DB statements '
+                'per listing' % (
+                    number, run.listings, run.duration, run.prices_inserted,
+                    run.prices_extended, run.listings_unchanged,
+                    run.bytes_fetched / 1024, run.statements / run.listings
+                )
+            )
+            for stage, timing in sorted(run.get_timings().items()):
+                self.stdout.write(
+                    '  %-9s %6d x, %8.2fs total, p50 %.1fms, p90 %.1fms, '
+                    'p99 %.1fms' % (
+                        stage, timing['count'], timing['seconds'],
+                        timing['p50'], timing['p90'], timing['p99']
+                    )
+                )
+            if run.get_errors():
+                self.stdout.write('  errors: %s' % ', '.join(
+                    '%s %d' % error for error in sorted(run.get_errors().items())
+                ))
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.13 on 2026-10-18 12:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricing', '0011_auto_20191014_1523'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='price',
+            index=models.Index(fields=['listing', 'condition', 'is_current', 'time'], name='pricing_pri_listing_ec6b4a_idx'),
+        ),
+    ]
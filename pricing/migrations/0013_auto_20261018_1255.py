@@ -0,0 +1,23 @@
+# Generated by Django 2.2.13 on 2026-10-18 12:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricing', '0012_auto_20261018_1255'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='failures',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='next_fetch',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.13 on 2026-10-18 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricing', '0013_auto_20261018_1255'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='fingerprint',
+            field=models.CharField(blank=True, max_length=40),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 2.2.13 on 2026-10-18 13:01
+
+from django.db import migrations, models
+
+
+def retire_duplicate_current_prices(apps, schema_editor):
+    """
+    Keep only the latest current price of each listing and condition, so the
+    unique constraint can be created.
+    """
+    Price = apps.get_model('pricing', 'Price')
+    latest = Price.objects.filter(
+        listing=models.OuterRef('listing'),
+        condition=models.OuterRef('condition'), is_current=True
+    ).order_by('-time', '-pk').values('pk')[:1]
+    Price.objects.filter(is_current=True).exclude(
+        pk=models.Subquery(latest)
+    ).update(is_current=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricing', '0014_listing_fingerprint'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            retire_duplicate_current_prices, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='price',
+            constraint=models.UniqueConstraint(condition=models.Q(is_current=True), fields=('listing', 'condition'), name='unique_current_price'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.13 on 2026-10-18 13:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricing', '0015_auto_20261018_1301'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='lease_expires',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='lease_owner',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+    ]
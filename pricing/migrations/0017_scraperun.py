@@ -0,0 +1,37 @@
+# Generated by Django 2.2.13 on 2026-10-18 13:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricing', '0016_auto_20261018_1308'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScrapeRun',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('owner', models.CharField(max_length=100)),
+                ('retailers', models.CharField(max_length=255)),
+                ('started', models.DateTimeField(db_index=True)),
+                ('finished', models.DateTimeField()),
+                ('listings', models.PositiveIntegerField(default=0)),
+                ('requests', models.PositiveIntegerField(default=0)),
+                ('bytes_fetched', models.BigIntegerField(default=0)),
+                ('statements', models.PositiveIntegerField(default=0)),
+                ('prices_inserted', models.PositiveIntegerField(default=0)),
+                ('prices_extended', models.PositiveIntegerField(default=0)),
+                ('listings_unchanged', models.PositiveIntegerField(default=0)),
+                ('listings_deleted', models.PositiveIntegerField(default=0)),
+                ('listings_failed', models.PositiveIntegerField(default=0)),
+                ('errors', models.TextField(default='{}')),
+                ('timings', models.TextField(default='{}')),
+            ],
+            options={
+                'ordering': ['-started'],
+            },
+        ),
+    ]
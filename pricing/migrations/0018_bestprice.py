@@ -0,0 +1,52 @@
+# Generated by Django 2.2.13 on 2026-10-18 13:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_best_prices(apps, schema_editor):
+    """
+    Compute the best price of every product and condition from the current
+    prices.
+    """
+    Price = apps.get_model('pricing', 'Price')
+    BestPrice = apps.get_model('pricing', 'BestPrice')
+    prices = Price.objects.filter(is_current=True).exclude(
+        total=None
+    ).order_by('total', '-time').values_list(
+        'listing__variant__product', 'condition', 'price', 'total',
+        'shipping_type'
+    )
+    best = {}
+    for product_id, condition, price, total, shipping_type in prices:
+        best.setdefault((product_id, condition), BestPrice(
+            product_id=product_id, condition=condition, price=price,
+            total=total, shipping_type=shipping_type
+        ))
+    BestPrice.objects.bulk_create(best.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_product_image'),
+        ('pricing', '0017_scraperun'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BestPrice',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('condition', models.CharField(choices=[('new', 'New'), ('used', 'Used'), ('refurb', 'Refurbished')], max_length=10)),
+                ('price', models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True)),
+                ('total', models.DecimalField(decimal_places=2, max_digits=9)),
+                ('shipping_type', models.CharField(blank=True, choices=[('prime', 'Prime')], max_length=10)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='best_prices', to='products.Product')),
+            ],
+            options={
+                'unique_together': {('product', 'condition')},
+            },
+        ),
+        migrations.RunPython(create_best_prices, migrations.RunPython.noop),
+    ]
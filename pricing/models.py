@@ -1,9 +1,91 @@
-from django.db import models
+import json
 
-from products.models import Variant
+from django.db import models, transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from products.cards import invalidate_cards
+from products.models import Product, Variant
+from pricing.scraper.retailers import RETAILERS
+
+class ListingQuerySet(models.QuerySet):
+    def due(self, now):
+        """
+        Filter the queryset down to listings due for a refresh. Listings
+        which have never been scheduled are due.
+
+        Parameters:
+            now (datetime): Current time
+
+        Returns:
+            QuerySet: Listings due at the given time
+        """
+        return self.filter(
+            models.Q(next_fetch=None) | models.Q(next_fetch__lte=now)
+        )
+
+    def claim(self, owner, limit, duration):
+        """
+        Lease due listings which nobody else holds a live lease on, new
+        listings first and then the most overdue. Expired leases are taken
+        over. The listings are picked and leased by a single UPDATE which
+        checks the lease is still free, so when two workers race for a
+        listing only one of them gets it.
+
+        Parameters:
+            owner (string): Name of the worker claiming the listings
+            limit (int): Maximum number of listings to claim, or None
+            duration (timedelta): How long the lease lasts unless renewed
+
+        Returns:
+            list: Claimed Listing objects, with their variants
+        """
+        now = timezone.now()
+        expires = now + duration
+        free = models.Q(lease_expires=None) | models.Q(lease_expires__lte=now)
+        order = ('-new', models.F('next_fetch').asc(nulls_first=True))
+        candidates = self.filter(free).due(now).order_by(*order)
+        self.filter(free, pk__in=candidates.values('pk')[:limit]).update(
+            lease_owner=owner, lease_expires=expires
+        )
+        return list(self.filter(
+            lease_owner=owner, lease_expires=expires
+        ).select_related('variant').order_by(*order))
+
+    def renew(self, owner, duration):
+        """
+        Extend the leases held by a worker.
+
+        Parameters:
+            owner (string): Name of the worker holding the leases
+            duration (timedelta): How long the leases last from now
+
+        Returns:
+            int: Number of leases renewed
+        """
+        return self.filter(lease_owner=owner).update(
+            lease_expires=timezone.now() + duration
+        )
+
+    def release(self, owner):
+        """
+        Give up the leases held by a worker.
+
+        Parameters:
+            owner (string): Name of the worker holding the leases
+
+        Returns:
+            int: Number of leases released
+        """
+        return self.filter(lease_owner=owner).update(
+            lease_owner='', lease_expires=None
+        )
 
 class Listing(models.Model):
-    RETAILERS = (('amazon', 'Amazon'),)
+    RETAILERS = tuple(
+        (retailer.name, retailer.label) for retailer in RETAILERS.values()
+    )
     CONDITIONS = (('refurb', 'Refurbished'),)
 
     variant = models.ForeignKey(Variant, on_delete=models.CASCADE)
@@ -15,19 +97,59 @@ class Listing(models.Model):
     identifier = models.CharField(max_length=255, unique=True)
     new = models.BooleanField(default=True)
     time = models.DateTimeField(auto_now=True)
+    next_fetch = models.DateTimeField(blank=True, null=True, db_index=True)
+    failures = models.PositiveSmallIntegerField(default=0)
+    fingerprint = models.CharField(max_length=40, blank=True)
+    lease_owner = models.CharField(max_length=100, blank=True)
+    lease_expires = models.DateTimeField(blank=True, null=True, db_index=True)
+
+    objects = ListingQuerySet.as_manager()
 
     def __str__(self):
         condition = '(Refurbished)' if self.condition else ''
         return '%s %s %s %s' % (
-            self.variant.product, self.variant.name, 'Amazon', condition
+            self.variant.product, self.variant.name,
+            self.get_retailer_display(), condition
         )
 
     def save(self, *args, **kwargs):
-        self.url = 'https://www.amazon.com/dp/%s?tag=fetchingtech-20' % (
-            self.identifier
-        )
+        self.url = RETAILERS[self.retailer].listing_url(self.identifier)
         super(Listing, self).save(*args, **kwargs)
 
+class PriceManager(models.Manager):
+    def ingest(self, prices):
+        """
+        Insert new current prices in bulk. The prices they replace are retired
+        with a single UPDATE beforehand.
+
+        Parameters:
+            prices (list): Unsaved Price objects, at most one per listing and
+                condition
+
+        Returns:
+            list: The created prices
+        """
+        listings = {}
+        for price in prices:
+            price.is_current = True
+            price.total = price.calculate_total()
+            listings.setdefault(price.condition, []).append(price.listing_id)
+        if not listings:
+            return []
+
+        retired = models.Q()
+        listing_ids = set()
+        for condition, ids in listings.items():
+            retired |= models.Q(condition=condition, listing_id__in=ids)
+            listing_ids.update(ids)
+        with transaction.atomic():
+            self.filter(retired, is_current=True).update(is_current=False)
+            created = self.bulk_create(prices)
+            BestPrice.objects.refresh(Variant.objects.filter(
+                listing__in=listing_ids
+            ).values_list('product', flat=True))
+            return created
+
 class Price(models.Model):
     CONDITIONS = (('new', 'New'), ('used', 'Used'), ('refurb', 'Refurbished'))
     SHIPPING = (('prime', 'Prime'),)
@@ -50,9 +172,146 @@ class Price(models.Model):
     time = models.DateTimeField(auto_now=True)
     is_current = models.BooleanField(default=True)
 
+    objects = PriceManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['listing', 'condition', 'is_current', 'time'])
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['listing', 'condition'],
+                condition=models.Q(is_current=True),
+                name='unique_current_price'
+            )
+        ]
+
+    def calculate_total(self):
+        if self.price is None:
+            return None
+        return self.price + (self.shipping or 0)
+
     def save(self, *args, **kwargs):
-        Price.objects.filter(
-            listing=self.listing, condition=self.condition, is_current=True
-        ).exclude(pk=self.pk).update(is_current=False)
-        self.total = self.price + self.shipping
-        super(Price, self).save(*args, **kwargs)
+        self.total = self.calculate_total()
+        with transaction.atomic():
+            if self._state.adding and self.is_current:
+                Price.objects.filter(
+                    listing_id=self.listing_id, condition=self.condition,
+                    is_current=True
+                ).update(is_current=False)
+            super(Price, self).save(*args, **kwargs)
+            BestPrice.objects.refresh(Variant.objects.filter(
+                listing=self.listing_id
+            ).values_list('product', flat=True))
+
+class BestPriceManager(models.Manager):
+    def refresh(self, products):
+        """
+        Recompute the best prices of products from their current prices, in
+        at most four statements whatever the number of products, and drop
+        their cached cards and pages once the transaction commits.
+
+        Parameters:
+            products (iterable): Product primary keys, or a queryset of them
+
+        Returns:
+            list: The created best prices
+        """
+        products = set(products)
+        if not products:
+            return []
+        prices = Price.objects.filter(
+            listing__variant__product__in=products, is_current=True
+        ).exclude(total=None).order_by('total', '-time').values_list(
+            'listing__variant__product', 'condition', 'price', 'total',
+            'shipping_type'
+        )
+        best = {}
+        for product_id, condition, price, total, shipping_type in prices:
+            best.setdefault((product_id, condition), BestPrice(
+                product_id=product_id, condition=condition, price=price,
+                total=total, shipping_type=shipping_type
+            ))
+        with transaction.atomic():
+            self.filter(product__in=products).delete()
+            created = self.bulk_create(best.values())
+            transaction.on_commit(lambda: invalidate_cards(products))
+            transaction.on_commit(
+                lambda: Product.objects.filter(pk__in=products).expire_pages()
+            )
+            return created
+
+class BestPrice(models.Model):
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name='best_prices'
+    )
+    condition = models.CharField(max_length=10, choices=Price.CONDITIONS)
+    price = models.DecimalField(
+        max_digits=8, decimal_places=2, blank=True, null=True
+    )
+    total = models.DecimalField(max_digits=9, decimal_places=2)
+    shipping_type = models.CharField(
+        max_length=10, blank=True, choices=Price.SHIPPING
+    )
+
+    objects = BestPriceManager()
+
+    class Meta:
+        unique_together = ('product', 'condition')
+
+    def __str__(self):
+        return '%s (%s)' % (self.product, self.condition)
+
+class ScrapeRun(models.Model):
+    owner = models.CharField(max_length=100)
+    retailers = models.CharField(max_length=255)
+    started = models.DateTimeField(db_index=True)
+    finished = models.DateTimeField()
+    listings = models.PositiveIntegerField(default=0)
+    requests = models.PositiveIntegerField(default=0)
+    bytes_fetched = models.BigIntegerField(default=0)
+    statements = models.PositiveIntegerField(default=0)
+    prices_inserted = models.PositiveIntegerField(default=0)
+    prices_extended = models.PositiveIntegerField(default=0)
+    listings_unchanged = models.PositiveIntegerField(default=0)
+    listings_deleted = models.PositiveIntegerField(default=0)
+    listings_failed = models.PositiveIntegerField(default=0)
+    errors = models.TextField(default='{}')
+    timings = models.TextField(default='{}')
+
+    class Meta:
+        ordering = ['-started']
+
+    def __str__(self):
+        return '%s %s' % (self.retailers, self.started)
+
+    @property
+    def duration(self):
+        return (self.finished - self.started).total_seconds()
+
+    def get_errors(self):
+        return json.loads(self.errors)
+
+    def get_timings(self):
+        return json.loads(self.timings)
+
+def refresh_after_commit(products):
+    products = list(products)
+    transaction.on_commit(lambda: BestPrice.objects.refresh(products))
+
+# Best prices are refreshed where prices are written; deletions, from the
+# admin or cascading from a listing, variant or product, are caught here.
+# The products are looked up straight away, as the rows leading to them
+# may be deleted next in the same cascade.
+@receiver(post_delete, sender=Price)
+def refresh_deleted_price(sender, instance, **kwargs):
+    if instance.is_current:
+        refresh_after_commit(Variant.objects.filter(
+            listing=instance.listing_id
+        ).values_list('product', flat=True))
+
+@receiver(post_delete, sender=Listing)
+def refresh_deleted_listing(sender, instance, **kwargs):
+    refresh_after_commit(Variant.objects.filter(
+        pk=instance.variant_id
+    ).values_list('product', flat=True))
@@ -0,0 +1,72 @@
+import math
+from datetime import timedelta
+
+from django.db.models import Count
+
+from .models import Price
+
+MIN_INTERVAL = timedelta(hours=1)
+MAX_INTERVAL = timedelta(days=1)
+VOLATILITY_WINDOW = timedelta(days=7)
+MAX_BACKOFF = 4
+
+def count_changes(listing_ids, now):
+    """
+    Count the price changes of each listing within the volatility window.
+    Every condition starts the window with one price, so any rows beyond
+    that are treated as changes.
+
+    Parameters:
+        listing_ids (iterable): Primary keys of the listings
+        now (datetime): End of the window
+
+    Returns:
+        dictionary: Number of changes keyed by listing id
+    """
+    rows = Price.objects.filter(
+        listing_id__in=listing_ids, time__gte=now-VOLATILITY_WINDOW
+    ).values('listing_id').annotate(
+        rows=Count('id'), conditions=Count('condition', distinct=True)
+    )
+    return {row['listing_id']: row['rows'] - row['conditions'] for row in rows}
+
+def refresh_interval(changes, rank, failures, new=False):
+    """
+    Work out how long to wait before fetching a listing again. Listings whose
+    prices change often, and best sellers, are fetched sooner, and listings
+    which have never been fetched successfully are retried soonest. Each
+    consecutive failed fetch doubles the wait, up to MAX_BACKOFF times.
+
+    Parameters:
+        changes (int): Price changes within the volatility window
+        rank (int): Sales rank of the listing's variant, if known
+        failures (int): Consecutive failed fetches
+        new (bool): Whether the listing has never been fetched successfully
+
+    Returns:
+        timedelta: Time until the listing is due
+    """
+    interval = MAX_INTERVAL / (changes+1)
+    if new:
+        interval = MIN_INTERVAL
+    elif rank:
+        interval *= min(max(0.5 + math.log10(rank)/4, 0.5), 2)
+    else:
+        interval *= 2
+    interval = min(max(interval, MIN_INTERVAL), MAX_INTERVAL)
+    return interval * 2**min(failures, MAX_BACKOFF)
+
+def schedule(listings, now):
+    """
+    Set the next fetch time of listings which have just been fetched.
+
+    Parameters:
+        listings (list): Listing objects, with their variants loaded
+        now (datetime): Time the listings were fetched
+    """
+    changes = count_changes([listing.pk for listing in listings], now)
+    for listing in listings:
+        listing.next_fetch = now + refresh_interval(
+            changes.get(listing.pk, 0), listing.variant.rank,
+            listing.failures, listing.new
+        )
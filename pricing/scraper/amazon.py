@@ -0,0 +1,350 @@
+import os
+import hmac
+import hashlib
+import base64
+from collections import namedtuple
+from urllib.parse import urlsplit, urlunparse, quote_plus
+from datetime import datetime
+from decimal import Decimal
+from xml.etree.ElementTree import iterparse
+
+from django.conf import settings
+
+from .base import RequestThrottled, Retailer
+
+BATCH_SIZE = 10
+
+ItemRecord = namedtuple('ItemRecord', (
+    'asin', 'image', 'rank', 'upc', 'ean', 'msrp', 'offers'
+))
+OfferRecord = namedtuple('OfferRecord', (
+    'condition', 'price', 'currency', 'prime', 'seller'
+))
+
+class Amazon(Retailer):
+    """
+    Retailer adapter for Amazon's Product Advertising API.
+    """
+    name = 'amazon'
+    label = 'Amazon'
+    color = '18, 52, 86'
+    batch_size = BATCH_SIZE
+    rate = 1/9
+    concurrency = 2
+
+    def listing_url(self, identifier):
+        return 'https://www.amazon.com/dp/%s?tag=fetchingtech-20' % identifier
+
+    def fetch(self, listings, session, stats):
+        return fetch_batch(listings, session, stats)
+
+    def parse(self, listing, item, error_code, upload):
+        AmazonListing(listing, upload).start_parse(item, error_code)
+
+class AmazonListing:
+    """
+    This class provides functionality for parsing information from Amazon's
+    Product API and queueing it for upload.
+
+    Attributes:
+        listing (Listing Object): Listing item stored in the database
+        upload (BatchUpload): Upload the parsed information is added to
+    """
+    def __init__(self, amazon_listing, upload):
+        """
+        Constructor for the AmazonListing class.
+
+        Parameters:
+            listing (Listing Object): Listing item pulled from the database
+            upload (BatchUpload): Upload the parsed information is added to
+        """
+        self.amazon_listing = amazon_listing
+        self.upload = upload
+
+    def start_parse(self, item=None, error_code=None):
+        """
+        Initiate the parsing of the listing's item data, as returned by a
+        batched lookup.
+
+        Parameters:
+            item (ItemRecord): Item response data, if the item was returned
+            error_code (string): Amazon error code reported for the item
+        """
+        if item:
+            self.loop_through_conditions(item)
+        else:
+            self.check_errors(error_code)
+
+    def check_errors(self, error_code):
+        """
+        Handle an error reported for the listing's item.
+
+        Parameters:
+            error_code (string): Amazon error code reported for the item
+        """
+        if error_code == 'AWS.ECommerceService.ItemNotAccessible':
+            self.upload.add_deletion(self.amazon_listing)
+        else:
+            self.upload.add_failure(self.amazon_listing)
+
+    def loop_through_conditions(self, item):
+        """
+        Check if the listing has a preassigned condition type. If not, check all
+        three condition types for offers. Call parse function on each condition
+        and on the product variant.
+
+        Parameters:
+            item (ItemRecord): Item data specific to the listing.
+        """
+        self.extract_variant(item)
+        if not self.amazon_listing.condition:
+            conditions = (
+                ('new', 'New'), ('used', 'Used'), ('refurb', 'Refurbished')
+            )
+            for condition in conditions:
+                offer = next(
+                    (x for x in item.offers if x.condition == condition[1]),
+                    None
+                )
+                self.extract_pricing(item, offer, condition[0])
+        else:
+            offer = item.offers[0] if item.offers else None
+            self.extract_pricing(item, offer, self.amazon_listing.condition)
+
+    def extract_variant(self, item):
+        """
+        Pull up-to-date information about the product variant from Amazon and
+        add it to the upload.
+
+        Parameters:
+            item (ItemRecord): Item response data
+        """
+        variant_info = {
+            'image': item.image, 'rank': item.rank, 'upc': item.upc,
+            'ean': item.ean, 'msrp': item.msrp
+        }
+
+        self.upload.add_variant(self.amazon_listing, variant_info)
+
+    def extract_pricing(self, item, offer, condition):
+        """
+        Retrieve any necessary pricing information from the item response for
+        one condition, and add it to the upload.
+
+        Parameters:
+            item (ItemRecord): Item response data
+            offer (OfferRecord): Item offer information
+            condition (string): The items condition as a string
+        """
+        if offer:
+            price = offer.price
+            currency = offer.currency
+            shipping_type = 'prime' if offer.prime else ''
+            seller = offer.seller
+        else:
+            price = None
+            currency = shipping_type = seller = ''
+        pricing_info = {
+            'condition': condition, 'price': price, 'currency': currency,
+            'total': price, 'shipping': None, 'shipping_type': shipping_type,
+            'seller': seller
+        }
+
+        self.upload.add_pricing(self.amazon_listing, pricing_info)
+
+def create_amazon_url(identifiers):
+    """
+    Create an Amazon API URL with query parameters and authorization signature.
+
+    Parameters:
+        identifiers (list): ASINs to look up, at most BATCH_SIZE of them
+
+    Returns:
+        string: Amazon API URL string
+    """
+    endpoint = urlsplit(settings.AMAZON_API_URL)
+    access_key = os.environ['AWS_ACCESS_KEY_ID']
+    secret_key = os.environ['AWS_SECRET_ACCESS_KEY'].encode()
+    assoc_tag = os.environ['AMAZON_ASSOCIATE_TAG']
+
+    query = sorted([
+        'Service=AWSECommerceService', 'Operation=ItemLookup',
+        'AWSAccessKeyId='+access_key, 'AssociateTag='+assoc_tag,
+        'ItemId='+'%2C'.join(identifiers), 'IdType=ASIN', 'Condition=All',
+        'ResponseGroup=Images%2CItemAttributes%2COfferFull%2CSalesRank',
+        'Timestamp='+datetime.utcnow().strftime('%Y-%m-%dT%H%%3A%M%%3A%SZ')
+    ])
+    message = 'GET\n%s\n%s\n%s' % (
+        endpoint.netloc, endpoint.path, '&'.join(query)
+    )
+    signature = base64.b64encode(
+        hmac.new(
+            secret_key,
+            msg=message.encode('utf-8'),
+            digestmod=hashlib.sha256
+        ).digest()
+    ).decode()
+    query.append('Signature='+quote_plus(signature))
+    url_tuple = (
+        endpoint.scheme, endpoint.netloc, endpoint.path, '',
+        '&'.join(query), ''
+    )
+    url = urlunparse(url_tuple)
+
+    return url
+
+def match_errors(identifiers, errors):
+    """
+    Assign each error in a batched response to the ASIN it was reported for.
+    Amazon includes the ASIN in most error messages; the rest are matched by
+    elimination, which is only possible when there is one error per ASIN
+    left and they all share the same code. ASINs left without a code are
+    retried as failures rather than deleted.
+
+    Parameters:
+        identifiers (list): ASINs missing from the response
+        errors (list): (code, message) tuples from the response
+
+    Returns:
+        dictionary: Error code keyed by ASIN
+    """
+    codes = {}
+    unmatched = []
+    for code, message in errors:
+        identifier = next((x for x in identifiers if x in message), None)
+        if identifier:
+            codes[identifier] = code
+        else:
+            unmatched.append(code)
+    remaining = [x for x in identifiers if x not in codes]
+    if (unmatched and len(unmatched) == len(remaining) and
+            len(set(unmatched)) == 1):
+        for identifier in remaining:
+            codes[identifier] = unmatched[0]
+    return codes
+
+def fetch_batch(listings, session, stats):
+    """
+    Look up a batch of listings with a single ItemLookup request and pair
+    each listing with its own item data or error code.
+
+    Parameters:
+        listings (list): Up to BATCH_SIZE Listing objects
+        session (Session): HTTP session to send the request with
+        stats (RunStats): Stats to record the sign, request and download
+            stages and the bytes fetched in
+
+    Returns:
+        list: (Listing, ItemRecord, error code) tuples
+    """
+    identifiers = [listing.identifier for listing in listings]
+    with stats.timer('sign'):
+        url = create_amazon_url(identifiers)
+    items, errors = parse_xml(url, session, stats)
+
+    items = {item.asin: item for item in items}
+    codes = match_errors([x for x in identifiers if x not in items], errors)
+    return [
+        (
+            listing, items.get(listing.identifier),
+            codes.get(listing.identifier)
+        ) for listing in listings
+    ]
+
+def parse_item(element):
+    """
+    Pull the fields we store out of a single Item element.
+
+    Parameters:
+        element (Element): Item element, with namespaces stripped
+
+    Returns:
+        ItemRecord: Item data and its offers
+    """
+    image = element.findtext('LargeImage/URL')
+    if image is None:
+        image = element.findtext('ImageSets/ImageSet/LargeImage/URL')
+    rank = element.findtext('SalesRank')
+    list_price = element.findtext('ItemAttributes/ListPrice/Amount')
+
+    offers = []
+    for offer in element.iterfind('Offers/Offer'):
+        price_data = offer.find('OfferListing/SalePrice')
+        if price_data is None:
+            price_data = offer.find('OfferListing/Price')
+        amount = price_data.findtext('Amount')
+        currency = price_data.findtext('CurrencyCode', '')
+        offers.append(OfferRecord(
+            condition=offer.findtext('OfferAttributes/Condition'),
+            price=Decimal(amount)/100 if amount is not None else None,
+            currency=currency if amount is not None else '',
+            prime=offer.findtext('OfferListing/IsEligibleForPrime') == '1',
+            seller=offer.findtext('Merchant/Name')
+        ))
+
+    return ItemRecord(
+        asin=element.findtext('ASIN'),
+        image=image,
+        rank=int(rank) if rank is not None else None,
+        upc=element.findtext('ItemAttributes/UPC', ''),
+        ean=element.findtext('ItemAttributes/EAN', ''),
+        msrp=Decimal(list_price)/100 if list_price is not None else None,
+        offers=offers
+    )
+
+def parse_response(source):
+    """
+    Incrementally parse an ItemLookup response. Each Item is turned into a
+    record and discarded as soon as its closing tag is read, so the full
+    document is never held in memory.
+
+    Parameters:
+        source (file object): Response body
+
+    Returns:
+        tuple: List of ItemRecords and list of (code, message) error tuples
+    """
+    items = []
+    errors = []
+    parents = []
+    for event, element in iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            element.tag = element.tag.rpartition('}')[2]
+            parents.append(element)
+            continue
+        parents.pop()
+        if element.tag == 'Item':
+            items.append(parse_item(element))
+            parents[-1].remove(element)
+        elif element.tag == 'Error':
+            errors.append((
+                element.findtext('Code'), element.findtext('Message', '')
+            ))
+    return items, errors
+
+def parse_xml(url, session, stats):
+    """
+    Request an Amazon API URL and parse the streamed XML response. Waiting
+    for the response headers is timed as the request stage, and reading and
+    parsing the streamed body as the download stage.
+
+    Parameters:
+        url (string): Signed Amazon API URL
+        session (Session): HTTP session to send the request with
+        stats (RunStats): Stats to record the stages and bytes fetched in
+
+    Returns:
+        tuple: List of ItemRecords and list of (code, message) error tuples
+    """
+    with stats.timer('request'):
+        response = session.get(url, stream=True)
+    with response:
+        if response.status_code == 503:
+            raise RequestThrottled(url)
+        response.raise_for_status()
+        response.raw.decode_content = True
+        with stats.timer('download'):
+            result = parse_response(response.raw)
+        # Bytes read off the wire, before decompression.
+        stats.count('bytes', response.raw.tell())
+        return result
@@ -0,0 +1,66 @@
+class RequestThrottled(Exception):
+    """
+    Raised by retailer adapters when a retailer turns a request away because
+    requests are being sent too quickly.
+    """
+
+class Retailer:
+    """
+    Interface implemented by the adapter of each retailer the scraper
+    supports. An adapter builds and sends the retailer's requests, parses the
+    responses, and adds the results to a BatchUpload as Price field values.
+
+    Attributes:
+        name (string): Listing.retailer value the adapter handles
+        label (string): Display name of the retailer
+        color (string): RGB triple used to draw the retailer's prices
+        batch_size (int): Listings looked up with a single request
+        rate (float): Default maximum number of requests per second
+        concurrency (int): Default number of fetch workers
+    """
+    name = None
+    label = None
+    color = '0, 0, 0'
+    batch_size = 1
+    rate = 1
+    concurrency = 1
+
+    def listing_url(self, identifier):
+        """
+        Build the link shown to users for a listing.
+
+        Parameters:
+            identifier (string): Retailer's identifier of the listing
+
+        Returns:
+            string: Product page URL
+        """
+        raise NotImplementedError
+
+    def fetch(self, listings, session, stats):
+        """
+        Request the current data of a batch of listings. Called on fetch
+        worker threads, so it must not touch the database.
+
+        Parameters:
+            listings (list): Up to batch_size Listing objects
+            session (Session): HTTP session to send requests with
+            stats (RunStats): Stats to record stage timings and bytes in
+
+        Returns:
+            list: (Listing, item data, error code) tuples
+        """
+        raise NotImplementedError
+
+    def parse(self, listing, item, error_code, upload):
+        """
+        Add the variant, pricing or deletion information parsed from one
+        listing's item data to an upload.
+
+        Parameters:
+            listing (Listing Object): Listing the data was fetched for
+            item: Item data returned by fetch, or None if missing
+            error_code (string): Error reported for the item
+            upload (BatchUpload): Upload to add the information to
+        """
+        raise NotImplementedError
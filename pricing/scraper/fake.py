@@ -0,0 +1,290 @@
+import time
+import random
+import threading
+from socketserver import ThreadingMixIn
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+from xml.sax.saxutils import escape
+
+NAMESPACE = 'http://webservices.amazon.com/AWSECommerceService/2013-08-01'
+NOT_ACCESSIBLE = 'AWS.ECommerceService.ItemNotAccessible'
+
+def item_scenario(asin):
+    """
+    Pick the response shape served for an ASIN. The choice only depends on the
+    ASIN, so repeated lookups of an item stay consistent.
+
+    Parameters:
+        asin (string): ASIN being looked up
+
+    Returns:
+        string: One of 'not_accessible', 'no_offer', 'image_sets',
+            'single_offer' or 'multi_offer'
+    """
+    bucket = sum(map(ord, asin)) % 20
+    if bucket == 0:
+        return 'not_accessible'
+    if bucket < 3:
+        return 'no_offer'
+    if bucket < 5:
+        return 'image_sets'
+    if bucket < 12:
+        return 'multi_offer'
+    return 'single_offer'
+
+def offer_xml(condition, amount, seller, prime, sale=False):
+    """
+    Render a single Offer element.
+
+    Parameters:
+        condition (string): Offer condition, as Amazon names it
+        amount (int): Price in cents
+        seller (string): Merchant name
+        prime (bool): Whether the offer is eligible for Prime
+        sale (bool): Whether to also include a lower SalePrice
+
+    Returns:
+        string: Offer XML
+    """
+    price = (
+        '<Price><Amount>%d</Amount><CurrencyCode>USD</CurrencyCode>'
+        '<FormattedPrice>$%.2f</FormattedPrice></Price>'
+    ) % (amount, amount/100)
+    if sale:
+        price += (
+            '<SalePrice><Amount>%d</Amount><CurrencyCode>USD</CurrencyCode>'
+            '</SalePrice>'
+        ) % (amount-500)
+    return (
+        '<Offer><Merchant><Name>%s</Name></Merchant>'
+        '<OfferAttributes><Condition>%s</Condition></OfferAttributes>'
+        '<OfferListing><OfferListingId>%s</OfferListingId>%s'
+        '<Availability>Usually ships in 24 hours</Availability>'
+        '<IsEligibleForSuperSaverShipping>0</IsEligibleForSuperSaverShipping>'
+        '<IsEligibleForPrime>%d</IsEligibleForPrime></OfferListing></Offer>'
+    ) % (escape(seller), condition, 'x'*60, price, prime)
+
+def item_xml(asin, scenario, price_shift=0):
+    """
+    Render an Item element shaped like a real ItemLookup response for the
+    Images, ItemAttributes, OfferFull and SalesRank response groups.
+
+    Parameters:
+        asin (string): ASIN of the item
+        scenario (string): Response shape, see item_scenario
+        price_shift (int): Cents added to every offer price
+
+    Returns:
+        string: Item XML
+    """
+    seed = sum(map(ord, asin))
+    base = 5000 + seed*37 % 100000 + price_shift
+    image = 'https://images-na.ssl-images-amazon.com/images/I/%s.jpg' % asin
+    image_xml = (
+        '<URL>%s</URL><Height Units="pixels">500</Height>'
+        '<Width Units="pixels">500</Width>'
+    ) % image
+
+    if scenario == 'image_sets':
+        images = (
+            '<ImageSets><ImageSet Category="primary"><LargeImage>%s'
+            '</LargeImage></ImageSet><ImageSet Category="variant"><LargeImage>'
+            '%s</LargeImage></ImageSet></ImageSets>'
+        ) % (image_xml, image_xml)
+    else:
+        images = (
+            '<SmallImage>%s</SmallImage><MediumImage>%s</MediumImage>'
+            '<LargeImage>%s</LargeImage>'
+        ) % (image_xml, image_xml, image_xml)
+
+    if scenario == 'multi_offer':
+        offers = (
+            offer_xml('New', base, 'Amazon.com', True, sale=seed % 2 == 0) +
+            offer_xml('Used', base*3//4, 'Second Hand Tech', False) +
+            offer_xml('Refurbished', base*4//5, 'Renewed & Co', True)
+        )
+        totals = (3, 1, 1, 1)
+    elif scenario == 'no_offer':
+        offers = ''
+        totals = (0, 0, 0, 0)
+    else:
+        offers = offer_xml('New', base, 'Amazon.com', seed % 2 == 0)
+        totals = (1, 1, 0, 0)
+
+    return (
+        '<Item><ASIN>%s</ASIN>'
+        '<DetailPageURL>https://www.amazon.com/dp/%s</DetailPageURL>'
+        '<SalesRank>%d</SalesRank>%s'
+        '<ItemAttributes><Binding>Electronics</Binding><Brand>Acme</Brand>'
+        '<EAN>0%011d</EAN><ListPrice><Amount>%d</Amount>'
+        '<CurrencyCode>USD</CurrencyCode></ListPrice><Title>Item %s</Title>'
+        '<UPC>%012d</UPC></ItemAttributes>'
+        '<OfferSummary><TotalNew>%d</TotalNew><TotalUsed>%d</TotalUsed>'
+        '<TotalCollectible>0</TotalCollectible>'
+        '<TotalRefurbished>%d</TotalRefurbished></OfferSummary>'
+        '<Offers><TotalOffers>%d</TotalOffers><TotalOfferPages>1'
+        '</TotalOfferPages><MoreOffersUrl>https://www.amazon.com/gp/offer-'
+        'listing/%s</MoreOffersUrl>%s</Offers></Item>'
+    ) % (
+        asin, asin, 1 + seed*7919 % 500000, images, seed, base*5//4,
+        asin, seed, totals[1], totals[2], totals[3], totals[0], asin, offers
+    )
+
+def lookup_xml(asins, price_shifts):
+    """
+    Render a full ItemLookupResponse for a batch of ASINs.
+
+    Parameters:
+        asins (list): ASINs being looked up
+        price_shifts (dictionary): Cents added to the prices of each ASIN
+
+    Returns:
+        string: Response XML
+    """
+    errors = []
+    items = []
+    for asin in asins:
+        scenario = item_scenario(asin)
+        if scenario == 'not_accessible':
+            errors.append(
+                '<Error><Code>%s</Code><Message>This item is not accessible '
+                'through the Product Advertising API.</Message></Error>'
+                % NOT_ACCESSIBLE
+            )
+        else:
+            items.append(item_xml(asin, scenario, price_shifts.get(asin, 0)))
+    errors = '<Errors>%s</Errors>' % ''.join(errors) if errors else ''
+    return (
+        '<?xml version="1.0" ?><ItemLookupResponse xmlns="%s">'
+        '<OperationRequest><RequestId>fake</RequestId></OperationRequest>'
+        '<Items><Request><IsValid>True</IsValid><ItemLookupRequest>'
+        '<IdType>ASIN</IdType><ItemId>%s</ItemId></ItemLookupRequest>%s'
+        '</Request>%s</Items></ItemLookupResponse>'
+    ) % (NAMESPACE, ','.join(asins), errors, ''.join(items))
+
+THROTTLED_XML = (
+    '<?xml version="1.0"?><ItemLookupErrorResponse xmlns="%s"><Error>'
+    '<Code>RequestThrottled</Code><Message>AWS Access Key ID: fake. You are '
+    'submitting requests too quickly. Please retry your requests at a slower '
+    'rate.</Message></Error><RequestId>fake</RequestId>'
+    '</ItemLookupErrorResponse>'
+) % NAMESPACE
+
+class ItemLookupHandler(BaseHTTPRequestHandler):
+    """
+    Answers ItemLookup requests with generated responses, after the server's
+    configured latency. Requests beyond the server's rate limit get the 503
+    RequestThrottled response Amazon sends.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        time.sleep(server.latency)
+        if server.throttled():
+            self.respond(503, THROTTLED_XML)
+            return
+
+        query = parse_qs(urlsplit(self.path).query)
+        asins = query.get('ItemId', [''])[0].split(',')
+        self.respond(200, lookup_xml(asins, server.price_shifts(asins)))
+
+    def respond(self, status, body):
+        body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/xml;charset=UTF-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super(ItemLookupHandler, self).log_message(format, *args)
+
+class FakeItemLookupServer(ThreadingMixIn, HTTPServer):
+    """
+    Local stand-in for the Product Advertising API's ItemLookup operation.
+
+    Attributes:
+        latency (float): Seconds to wait before answering each request
+        rate (float): Requests per second allowed before throttling, or None
+        change_rate (float): Chance that an item's price moves between lookups
+        requests (int): Requests answered so far
+        throttles (int): Requests answered with RequestThrottled
+    """
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), latency=0, rate=None,
+                 change_rate=0.1, verbose=False, seed=0):
+        """
+        Constructor for the FakeItemLookupServer class.
+
+        Parameters:
+            address (tuple): Host and port to listen on; port 0 picks one
+            latency (float): Seconds to wait before answering each request
+            rate (float): Requests per second allowed before throttling
+            change_rate (float): Chance that an item's price moves between
+                lookups
+            verbose (bool): Whether to log each request
+            seed (int): Seed for the price changes
+        """
+        super(FakeItemLookupServer, self).__init__(address, ItemLookupHandler)
+        self.latency = latency
+        self.rate = rate
+        self.change_rate = change_rate
+        self.verbose = verbose
+        self.random = random.Random(seed)
+        self.shifts = {}
+        self.requests = 0
+        self.throttles = 0
+        self.last_request = None
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        """
+        string: ItemLookup endpoint to point AMAZON_API_URL at
+        """
+        host, port = self.server_address[:2]
+        return 'http://%s:%d/onca/xml' % (host, port)
+
+    def throttled(self):
+        """
+        Count a request, and check whether it came sooner than the rate limit
+        allows after the previous accepted one.
+
+        Returns:
+            bool: Whether the request should be throttled
+        """
+        with self.lock:
+            self.requests += 1
+            now = time.monotonic()
+            if (self.rate and self.last_request is not None and
+                    now - self.last_request < 1/self.rate):
+                self.throttles += 1
+                return True
+            self.last_request = now
+            return False
+
+    def price_shifts(self, asins):
+        """
+        Move the price of some of the looked up items at random.
+
+        Parameters:
+            asins (list): ASINs being looked up
+
+        Returns:
+            dictionary: Current price shift in cents keyed by ASIN
+        """
+        with self.lock:
+            for asin in asins:
+                if self.random.random() < self.change_rate:
+                    self.shifts[asin] = self.random.randrange(-2000, 2000, 100)
+            return {asin: self.shifts.get(asin, 0) for asin in asins}
+
+    def start(self):
+        """
+        Serve requests on a background thread.
+        """
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
@@ -0,0 +1,562 @@
+import os
+import time
+import uuid
+import queue
+import socket
+import logging
+import threading
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from xml.etree.ElementTree import ParseError
+
+import requests
+from django.db import close_old_connections, connection
+from django.db.models import F
+from django.urls import reverse
+
+from pricing.models import Listing
+from products.models import Category, Product
+from products.pagecache import defer_expiry, expire_pages, warm_pages
+
+from .base import RequestThrottled
+from .session import CONNECT_TIMEOUT, READ_TIMEOUT, create_session
+from .stats import RunStats, log_event
+from .throttle import MAX_RETRIES, CircuitBreaker, TokenBucket, backoff
+from .upload import BatchUpload
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = 4
+POLL_INTERVAL = 1
+LEASE_DURATION = timedelta(minutes=5)
+REPORT_INTERVAL = 900
+PUBLISH_INTERVAL = 60
+MAX_UPLOAD_FAILURES = 5
+WARM_PRODUCTS = 10
+
+def error_code(error):
+    """
+    Name a fetch error for the error counts of a run.
+
+    Parameters:
+        error (Exception): Error raised while fetching a batch
+
+    Returns:
+        string: HTTP status for HTTP errors, otherwise the exception's name
+    """
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return 'HTTP %d' % error.response.status_code
+    return type(error).__name__
+
+def retryable(error):
+    """
+    Check whether a failed request is worth retrying: throttling, server
+    errors, network problems and truncated responses are.
+
+    Parameters:
+        error (Exception): Error raised while fetching a batch
+
+    Returns:
+        bool: Whether to retry
+    """
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code >= 500
+    return isinstance(error, (
+        RequestThrottled, requests.ConnectionError, requests.Timeout,
+        requests.exceptions.ChunkedEncodingError, ParseError
+    ))
+
+class RetailerPool:
+    """
+    Fetch workers of a single retailer, with their own HTTP session, rate
+    limiter and circuit breaker, so a slow or failing retailer does not hold
+    up the others.
+
+    Attributes:
+        retailer (Retailer): Adapter of the retailer
+        concurrency (int): Number of fetch workers
+        session (Session): HTTP session shared by the fetch workers
+        bucket (TokenBucket): Rate limiter of the retailer's requests
+        breaker (CircuitBreaker): Circuit breaker of the retailer's API
+        pending (int): Batches submitted and not consumed yet
+        stats (RunStats): Stats the workers record into
+    """
+    def __init__(self, retailer, rate=None, max_rate=None, concurrency=None,
+                 connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT):
+        """
+        Constructor for the RetailerPool class.
+
+        Parameters:
+            retailer (Retailer): Adapter of the retailer
+            rate (float): Requests per second to start at, the retailer's
+                default if not given
+            max_rate (float): Requests per second the rate may climb back to
+            concurrency (int): Number of fetch workers, the retailer's
+                default if not given
+            connect_timeout (float): Seconds to wait for a connection
+            read_timeout (float): Seconds to wait for data
+        """
+        self.retailer = retailer
+        self.concurrency = concurrency or retailer.concurrency
+        self.session = create_session(
+            self.concurrency, connect_timeout, read_timeout
+        )
+        self.bucket = TokenBucket(rate or retailer.rate, max_rate=max_rate)
+        self.breaker = CircuitBreaker()
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix=retailer.name
+        )
+        self.futures = []
+        self.pending = 0
+        self.stats = RunStats()
+
+    def submit(self, listings, results, stop, finished):
+        """
+        Queue listings to be fetched in batches by the workers. Each batch
+        ends up in the results queue as a (pool, batch, pairs, failed) tuple,
+        with no pairs if it failed or was skipped.
+
+        Parameters:
+            listings (list): Listing objects to refresh
+            results (Queue): Queue fetched batches are put in
+            stop (Event): When set, batches not fetched yet are skipped
+            finished (Event): Same as stop, set when the consumer is gone
+
+        Returns:
+            int: Number of batches submitted
+        """
+        size = self.retailer.batch_size
+        batches = [
+            listings[i:i+size] for i in range(0, len(listings), size)
+        ]
+        self.futures = [f for f in self.futures if not f.done()] + [
+            self.executor.submit(self.fetch, batch, results, stop, finished)
+            for batch in batches
+        ]
+        self.pending += len(batches)
+        return len(batches)
+
+    def fetch(self, batch, results, stop, finished):
+        """
+        Fetch a batch, retrying failed requests with jittered backoff.
+        Throttled requests also slow the pool's rate down.
+        """
+        attempt = 0
+        while not (finished.is_set() or stop.is_set()) and \
+                self.breaker.allow():
+            attempt += 1
+            stats = self.stats
+            with stats.timer('rate_wait'):
+                acquired = self.bucket.acquire(stop)
+            if not acquired or finished.is_set() or stop.is_set():
+                break
+            stats.count('requests')
+            try:
+                with stats.timer('fetch'):
+                    pairs = self.retailer.fetch(batch, self.session, stats)
+            except Exception as error:
+                stats.error(error_code(error))
+                self.breaker.record_failure()
+                if isinstance(error, RequestThrottled):
+                    self.bucket.decrease()
+                if not retryable(error) or attempt > MAX_RETRIES:
+                    logger.warning(
+                        'Giving up on %s batch after %d attempts',
+                        self.retailer.name, attempt, exc_info=True
+                    )
+                    results.put((self, batch, None, True))
+                    return
+                stats.count('retries')
+                stop.wait(backoff(attempt))
+            else:
+                self.breaker.record_success()
+                self.bucket.increase()
+                results.put((self, batch, pairs, False))
+                return
+        results.put((self, batch, None, False))
+
+    def running(self):
+        """
+        Returns:
+            bool: Whether any worker is still busy with a batch
+        """
+        return not all(future.done() for future in self.futures)
+
+    def close(self):
+        """
+        Shut the workers down and close the HTTP session.
+        """
+        self.executor.shutdown()
+        self.session.close()
+
+class Scheduler:
+    """
+    Runs the pools of several retailers side by side. A pool claims due
+    listings whenever its previous claim has been uploaded and its circuit
+    breaker is closed, so every retailer refreshes at its own pace. Fetched
+    batches from all pools are parsed and uploaded on the calling thread, one
+    transaction per batch, so only that thread touches the database. A
+    batch whose upload fails is released to be fetched again, and the run
+    goes on unless uploads keep failing.
+
+    Listings are leased in the database before they are fetched, so any
+    number of schedulers, on any number of machines, can share the work
+    without fetching a listing twice. Leases are renewed while their
+    listings are in flight, and released when they are uploaded or the run
+    ends. Leases of a scheduler which died expire and are claimed by others.
+
+    Timings and counters of every stage are recorded as the run goes, logged
+    as JSON per batch, and saved as a ScrapeRun row when the run ends, and
+    every report_interval seconds in between for long runs.
+
+    Almost every batch changes a product listed on the home, search and
+    top-level category pages, so the cached pages uploads expire are
+    collected and only expired every publish_interval seconds, and when
+    the run ends. With warm set, the most visited of those pages are then
+    rendered into the page cache again, so visitors keep being served from
+    the cache. Rendering them is not counted as the run's statements.
+
+    Attributes:
+        pools (list): RetailerPool objects to run
+        limit (int): Listings claimed at once per retailer, or None for all
+        idle (float): Seconds to wait when no listings are due
+        queue_size (int): Fetched batches allowed to wait for parsing
+        owner (string): Name leases are held under
+        lease (timedelta): How long a lease lasts unless renewed
+        leased (set): Primary keys of the listings in flight
+        lost (set): Primary keys of listings whose lease expired in flight
+        report_interval (float): Seconds between ScrapeRun rows of long runs
+        stats (RunStats): Stats of the current report period
+        publish_interval (float): Seconds between expiring the cached pages
+            of uploaded changes
+        expired (set): Page cache scopes expired since the last publish
+        changed (set): Primary keys of the products changed since then
+        warm (bool): Whether to warm the page cache after expiring it
+        warming (bool): Whether the page cache is being warmed
+        upload_failures (int): Uploads which failed since the last one
+            which succeeded
+    """
+    def __init__(self, pools, limit=60, idle=60, queue_size=QUEUE_SIZE,
+                 owner=None, lease=LEASE_DURATION,
+                 report_interval=REPORT_INTERVAL,
+                 publish_interval=PUBLISH_INTERVAL, warm=False):
+        self.pools = pools
+        self.limit = limit
+        self.idle = idle
+        self.queue_size = queue_size
+        self.owner = owner or '%s:%d:%s' % (
+            socket.gethostname()[:80], os.getpid(), uuid.uuid4().hex[:8]
+        )
+        self.lease = lease
+        self.leased = set()
+        self.lost = set()
+        self.report_interval = report_interval
+        self.stats = RunStats()
+        self.publish_interval = publish_interval
+        self.expired = set()
+        self.changed = set()
+        self.warm = warm
+        self.warming = False
+        self.upload_failures = 0
+
+    def claim(self, pool, results, stop, finished):
+        """
+        Lease the due listings of a pool's retailer and submit them to its
+        workers.
+
+        Returns:
+            int: Number of listings claimed
+        """
+        close_old_connections()
+        with self.stats.timer('claim'):
+            listings = Listing.objects.filter(
+                retailer=pool.retailer.name
+            ).claim(self.owner, self.limit, self.lease)
+        if listings:
+            self.leased.update(listing.pk for listing in listings)
+            pool.submit(listings, results, stop, finished)
+        return len(listings)
+
+    def renew(self):
+        """
+        Extend the leases of the listings in flight. Listings whose lease
+        could not be renewed have been claimed by another scheduler, and are
+        dropped when their batch arrives.
+        """
+        in_flight = self.leased - self.lost
+        listings = Listing.objects.filter(pk__in=in_flight)
+        if listings.renew(self.owner, self.lease) < len(in_flight):
+            held = set(listings.filter(
+                lease_owner=self.owner
+            ).values_list('pk', flat=True))
+            lost = in_flight - held
+            logger.warning('Lost the leases of %d listings', len(lost))
+            self.lost |= lost
+
+    def consume(self, pool, batch, pairs, failed):
+        """
+        Parse and upload a fetched batch. Skipped batches have their leases
+        released so the listings can be claimed again straight away.
+
+        Returns:
+            int: Number of listings refreshed or recorded as failed
+        """
+        pool.pending -= 1
+        ids = {listing.pk for listing in batch}
+        self.leased -= ids
+        lost = ids & self.lost
+        self.lost -= ids
+        if pairs is None and not failed:
+            Listing.objects.filter(pk__in=ids - lost).release(self.owner)
+            return 0
+        if lost:
+            batch = [listing for listing in batch if listing.pk not in lost]
+            pairs = pairs and [pair for pair in pairs if pair[0].pk not in lost]
+        stats = self.stats
+        upload = BatchUpload()
+        parse_times = {}
+        if failed:
+            for each_listing in batch:
+                upload.add_failure(each_listing)
+        else:
+            for each_listing, item, code in pairs:
+                if code:
+                    stats.error(code)
+                start = time.perf_counter()
+                pool.retailer.parse(each_listing, item, code, upload)
+                parse_times[each_listing] = time.perf_counter() - start
+                stats.record('parse', parse_times[each_listing])
+        statements = stats.counters['statements']
+        try:
+            with stats.timer('upload'), defer_expiry(self.expired):
+                upload.commit()
+        except Exception as error:
+            self.upload_failed(pool, batch, error)
+            return 0
+        self.upload_failures = 0
+        self.changed |= upload.changed
+
+        counts = {
+            'listings': len(batch),
+            'prices_inserted': upload.inserted,
+            'prices_extended': upload.extended,
+            'listings_unchanged': len(upload.unchanged),
+            'listings_deleted': len(upload.deletions),
+            'listings_failed': len(upload.failures)
+        }
+        for name, amount in counts.items():
+            stats.count(name, amount)
+        log_event(
+            logger, 'scrape.batch', retailer=pool.retailer.name,
+            upload_ms=round(stats.timings['upload'][-1]*1000, 1),
+            statements=stats.counters['statements'] - statements, **counts
+        )
+        if logger.isEnabledFor(logging.DEBUG):
+            self.log_listings(pool, batch, pairs, upload, parse_times)
+        return len(batch)
+
+    def upload_failed(self, pool, batch, error):
+        """
+        Release the leases of a batch whose upload failed, so its listings
+        are fetched again, and carry on with the run. Once uploads have
+        failed MAX_UPLOAD_FAILURES times in a row the error is unlikely to
+        clear up by itself, and is raised again.
+
+        Parameters:
+            pool (RetailerPool): Pool which fetched the batch
+            batch (list): Listing objects of the batch
+            error (Exception): Error raised by the upload
+        """
+        self.upload_failures += 1
+        self.stats.error('upload %s' % type(error).__name__)
+        if self.upload_failures >= MAX_UPLOAD_FAILURES:
+            raise error
+        logger.error(
+            'Could not upload %s batch of %d listings', pool.retailer.name,
+            len(batch), exc_info=True
+        )
+        try:
+            Listing.objects.filter(
+                pk__in=[listing.pk for listing in batch]
+            ).release(self.owner)
+        except Exception:
+            # The leases expire on their own.
+            logger.warning('Could not release the leases', exc_info=True)
+
+    def publish(self):
+        """
+        Expire the cached pages of the changes uploaded since the last call,
+        and with warm set render the most visited of them again.
+        """
+        if self.expired:
+            expire_pages(self.expired)
+            self.expired.clear()
+        if self.warm and self.changed:
+            self.warming = True
+            try:
+                with self.stats.timer('warm'):
+                    warm_pages(self.hot_paths(self.changed))
+            finally:
+                self.warming = False
+        self.changed.clear()
+
+    def hot_paths(self, product_ids):
+        """
+        Pick the most visited pages which may show some products: the home
+        page, the first page of every top-level category and the pages of
+        the best ranked of the products.
+
+        Parameters:
+            product_ids (iterable): Primary keys of the products
+
+        Returns:
+            list: Paths of the pages
+        """
+        paths = [reverse('home')]
+        paths.extend(
+            reverse('category', args=[slug]) for slug in
+            Category.objects.filter(parent=None).values_list('slug', flat=True)
+        )
+        products = Product.objects.filter(pk__in=product_ids).order_by(
+            F('rank').asc(nulls_last=True)
+        ).values_list('slug', flat=True)[:WARM_PRODUCTS]
+        paths.extend(reverse('product', args=[slug]) for slug in products)
+        return paths
+
+    def log_listings(self, pool, batch, pairs, upload, parse_times):
+        """
+        Log the outcome and parse time of every listing of an uploaded batch.
+        """
+        codes = {pair[0]: pair[2] for pair in pairs or ()}
+        deleted = set(upload.deletions)
+        failed = set(upload.failures)
+        for each_listing in batch:
+            if each_listing in deleted:
+                outcome = 'deleted'
+            elif each_listing in failed:
+                outcome = 'failed'
+            elif each_listing in upload.unchanged:
+                outcome = 'unchanged'
+            else:
+                outcome = 'refreshed'
+            log_event(
+                logger, 'scrape.listing', logging.DEBUG,
+                listing=each_listing.pk, retailer=pool.retailer.name,
+                outcome=outcome, error=codes.get(each_listing),
+                parse_ms=round(parse_times.get(each_listing, 0)*1000, 3)
+            )
+
+    def report(self):
+        """
+        Save and log the stats of the current report period, if anything
+        was fetched, and start a new period.
+        """
+        stats = self.stats
+        if stats.counters['requests'] or stats.counters['listings']:
+            run = stats.save(
+                self.owner, [pool.retailer.name for pool in self.pools]
+            )
+            log_event(
+                logger, 'scrape.run', run=run.pk, seconds=run.duration,
+                **stats.summary()
+            )
+        self.stats = RunStats()
+        for pool in self.pools:
+            pool.stats = self.stats
+
+    def count_statement(self, execute, sql, params, many, context):
+        if self.warming:
+            return execute(sql, params, many, context)
+        return self.stats.count_statement(execute, sql, params, many, context)
+
+    def run(self, stop=None, once=False):
+        """
+        Refresh due listings until stopped.
+
+        Parameters:
+            stop (Event): When set, batches which have not been fetched yet
+                are skipped and the run ends once the fetched ones are
+                uploaded
+            once (bool): Claim listings once per retailer and return when
+                they are uploaded
+
+        Returns:
+            int: Number of listings refreshed or recorded as failed
+        """
+        self.report()
+        try:
+            with connection.execute_wrapper(self.count_statement):
+                return self.refresh(stop, once)
+        finally:
+            self.publish()
+            self.report()
+
+    def refresh(self, stop, once):
+        stop = stop or threading.Event()
+        finished = threading.Event()
+        results = queue.Queue(maxsize=self.queue_size)
+        unclaimed = set(self.pools)
+        # Monotonic time until which a pool with nothing due is left alone.
+        resume = {pool: 0 for pool in self.pools}
+        renew_at = time.monotonic() + self.lease.total_seconds() / 3
+        report_at = time.monotonic() + self.report_interval
+        publish_at = time.monotonic() + self.publish_interval
+        refreshed = 0
+        try:
+            while True:
+                if self.leased and time.monotonic() >= renew_at:
+                    self.renew()
+                    renew_at = time.monotonic() + self.lease.total_seconds() / 3
+                if time.monotonic() >= report_at:
+                    self.report()
+                    report_at = time.monotonic() + self.report_interval
+                if time.monotonic() >= publish_at:
+                    self.publish()
+                    publish_at = time.monotonic() + self.publish_interval
+
+                for pool in self.pools:
+                    if stop.is_set() or pool.pending or \
+                            pool.breaker.remaining() or \
+                            resume[pool] > time.monotonic() or \
+                            (once and pool not in unclaimed):
+                        continue
+                    unclaimed.discard(pool)
+                    if not self.claim(pool, results, stop, finished):
+                        resume[pool] = time.monotonic() + self.idle
+
+                if not any(pool.pending for pool in self.pools):
+                    if stop.is_set() or (once and not unclaimed):
+                        break
+                    # Nothing in flight: sleep until a pool may have listings
+                    # due, its open circuit lets a request through, or
+                    # changes are to be published.
+                    now = time.monotonic()
+                    wake = [
+                        max(resume[pool] - now, pool.breaker.remaining())
+                        for pool in (unclaimed if once else self.pools)
+                    ]
+                    if self.expired or self.changed:
+                        wake.append(publish_at - now)
+                    stop.wait(max(min(wake), 0))
+                    continue
+
+                try:
+                    result = results.get(timeout=POLL_INTERVAL)
+                except queue.Empty:
+                    continue
+                refreshed += self.consume(*result)
+        finally:
+            # Stop workers picking up new batches, and drain the queue so the
+            # ones still fetching are not left blocked on it.
+            finished.set()
+            while any(pool.running() for pool in self.pools):
+                try:
+                    results.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            for pool in self.pools:
+                pool.pending = 0
+            Listing.objects.release(self.owner)
+            self.leased.clear()
+            self.lost.clear()
+        return refreshed
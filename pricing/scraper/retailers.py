@@ -0,0 +1,3 @@
+from .amazon import Amazon
+
+RETAILERS = {retailer.name: retailer for retailer in (Amazon(),)}
@@ -0,0 +1,52 @@
+import requests
+from requests.adapters import HTTPAdapter
+
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 30
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """
+    Transport adapter that applies a default timeout to every request sent
+    through it.
+
+    Attributes:
+        timeout (tuple): Connect and read timeouts in seconds
+    """
+    def __init__(self, *args, timeout=None, **kwargs):
+        """
+        Constructor for the TimeoutHTTPAdapter class.
+
+        Parameters:
+            timeout (tuple): Connect and read timeouts in seconds
+        """
+        self.timeout = timeout
+        super(TimeoutHTTPAdapter, self).__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super(TimeoutHTTPAdapter, self).send(request, **kwargs)
+
+def create_session(pool_size, connect_timeout=CONNECT_TIMEOUT,
+                   read_timeout=READ_TIMEOUT):
+    """
+    Create an HTTP session whose keep-alive connections are shared by the
+    fetch workers.
+
+    Parameters:
+        pool_size (int): Connections kept open per host
+        connect_timeout (float): Seconds to wait for a connection
+        read_timeout (float): Seconds to wait between bytes of the response
+
+    Returns:
+        Session: Configured requests session
+    """
+    session = requests.Session()
+    adapter = TimeoutHTTPAdapter(
+        pool_connections=1, pool_maxsize=pool_size, pool_block=True,
+        timeout=(connect_timeout, read_timeout)
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers['Accept-Encoding'] = 'gzip'
+    return session
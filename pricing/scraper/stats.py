@@ -0,0 +1,150 @@
+import json
+import time
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from django.utils import timezone
+
+from pricing.models import ScrapeRun
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of a list of numbers.
+
+    Parameters:
+        values (list): Numbers to pick from
+        fraction (float): Percentile as a fraction between 0 and 1
+
+    Returns:
+        float: The percentile, or 0 when there are no values
+    """
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(int(fraction * len(values)), len(values)-1)]
+
+def log_event(logger, event, level=logging.INFO, **fields):
+    """
+    Log an event as a single JSON object, so log processors can parse it.
+    The fields are also attached to the record as its fields attribute.
+
+    Parameters:
+        logger (Logger): Logger to emit the record with
+        event (string): Name of the event
+        level (int): Logging level of the record
+        **fields: Data describing the event
+    """
+    fields['event'] = event
+    logger.log(
+        level, json.dumps(fields, sort_keys=True, default=str),
+        extra={'fields': fields}
+    )
+
+class RunStats:
+    """
+    Thread-safe timings and counters of a scrape run. Fetch workers and the
+    uploading thread record into the same object, which is then saved as a
+    ScrapeRun row.
+
+    Attributes:
+        started (datetime): When the run started
+        timings (dictionary): Durations in seconds keyed by stage
+        counters (Counter): Event counts keyed by name
+        errors (Counter): Error counts keyed by code
+    """
+    def __init__(self):
+        """
+        Constructor for the RunStats class.
+        """
+        self.started = timezone.now()
+        self.timings = {}
+        self.counters = Counter()
+        self.errors = Counter()
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def timer(self, stage):
+        """
+        Time the enclosed block as one occurrence of a stage.
+
+        Parameters:
+            stage (string): Name of the stage
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def record(self, stage, seconds):
+        with self.lock:
+            self.timings.setdefault(stage, []).append(seconds)
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def error(self, code):
+        with self.lock:
+            self.errors[code] += 1
+
+    def count_statement(self, execute, sql, params, many, context):
+        """
+        Database execute wrapper counting the statements issued.
+        """
+        self.count('statements')
+        return execute(sql, params, many, context)
+
+    def summary(self):
+        """
+        Summarise the run so far.
+
+        Returns:
+            dictionary: Counters, errors, and the count, total seconds and
+                p50, p90, p99 and maximum milliseconds of every stage
+        """
+        with self.lock:
+            timings = {
+                stage: {
+                    'count': len(durations),
+                    'seconds': round(sum(durations), 3),
+                    'p50': round(percentile(durations, .5)*1000, 3),
+                    'p90': round(percentile(durations, .9)*1000, 3),
+                    'p99': round(percentile(durations, .99)*1000, 3),
+                    'max': round(max(durations)*1000, 3)
+                } for stage, durations in self.timings.items()
+            }
+            return {
+                'counters': dict(self.counters), 'errors': dict(self.errors),
+                'timings': timings
+            }
+
+    def save(self, owner, retailers):
+        """
+        Store a summary row for the run.
+
+        Parameters:
+            owner (string): Name of the scheduler which ran it
+            retailers (list): Names of the retailers it refreshed
+
+        Returns:
+            ScrapeRun: The saved row
+        """
+        summary = self.summary()
+        counters = summary['counters']
+        return ScrapeRun.objects.create(
+            owner=owner, retailers=','.join(retailers), started=self.started,
+            finished=timezone.now(), listings=counters.get('listings', 0),
+            requests=counters.get('requests', 0),
+            bytes_fetched=counters.get('bytes', 0),
+            statements=counters.get('statements', 0),
+            prices_inserted=counters.get('prices_inserted', 0),
+            prices_extended=counters.get('prices_extended', 0),
+            listings_unchanged=counters.get('listings_unchanged', 0),
+            listings_deleted=counters.get('listings_deleted', 0),
+            listings_failed=counters.get('listings_failed', 0),
+            errors=json.dumps(summary['errors'], sort_keys=True),
+            timings=json.dumps(summary['timings'], sort_keys=True)
+        )
@@ -0,0 +1,174 @@
+import time
+import random
+import threading
+
+RATE_INCREASE = 0.05
+RATE_DECREASE = 0.5
+MIN_RATE_FRACTION = 1/16
+MAX_RETRIES = 4
+BACKOFF_BASE = 1
+BACKOFF_CAP = 60
+FAILURE_THRESHOLD = 10
+COOLDOWN = 60
+MAX_COOLDOWN = 900
+
+class TokenBucket:
+    """
+    Thread-safe token bucket used to keep requests under the API's rate limit
+    while sharing the budget between fetch workers. The rate adapts to the
+    API with additive increase and multiplicative decrease: every successful
+    request raises it a little, up to max_rate, and every throttled one cuts
+    it, down to min_rate.
+
+    Attributes:
+        rate (float): Tokens added per second
+        capacity (float): Maximum number of tokens held at once
+        max_rate (float): Highest rate the bucket will climb back to
+        min_rate (float): Lowest rate the bucket will fall to
+    """
+    def __init__(self, rate, capacity=1, max_rate=None, min_rate=None):
+        """
+        Constructor for the TokenBucket class. The bucket starts full.
+
+        Parameters:
+            rate (float): Tokens added per second
+            capacity (float): Maximum number of tokens held at once
+            max_rate (float): Highest rate, the starting rate by default
+            min_rate (float): Lowest rate, a fraction of max_rate by default
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.max_rate = max_rate or rate
+        self.min_rate = min_rate or self.max_rate*MIN_RATE_FRACTION
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now-self.updated)*self.rate
+        )
+        self.updated = now
+
+    def acquire(self, stop=None):
+        """
+        Take a token from the bucket, blocking until one is available.
+
+        Parameters:
+            stop (Event): When set, stop waiting without taking a token
+
+        Returns:
+            bool: Whether a token was taken
+        """
+        stop = stop or threading.Event()
+        while True:
+            with self.lock:
+                self.refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1-self.tokens) / self.rate
+            if stop.wait(wait):
+                return False
+
+    def increase(self):
+        """
+        Raise the rate after a successful request.
+        """
+        with self.lock:
+            self.refill()
+            self.rate = min(
+                self.max_rate, self.rate + self.max_rate*RATE_INCREASE
+            )
+
+    def decrease(self):
+        """
+        Cut the rate after a throttled request.
+        """
+        with self.lock:
+            self.refill()
+            self.rate = max(self.min_rate, self.rate*RATE_DECREASE)
+
+class CircuitBreaker:
+    """
+    Stops requests to the API during sustained outages. After
+    FAILURE_THRESHOLD consecutive failed requests the circuit opens and no
+    requests are allowed until the cooldown has passed. A single trial
+    request is then let through; if it fails too the circuit opens again with
+    twice the cooldown.
+
+    Attributes:
+        failures (int): Consecutive failed requests
+        cooldown (float): Seconds the circuit stays open
+        opened (float): Monotonic time the circuit opened, or None if closed
+    """
+    def __init__(self, threshold=FAILURE_THRESHOLD, cooldown=COOLDOWN):
+        """
+        Constructor for the CircuitBreaker class.
+
+        Parameters:
+            threshold (int): Consecutive failures which open the circuit
+            cooldown (float): Seconds the circuit first stays open
+        """
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened = None
+        self.trial = False
+        self.lock = threading.Lock()
+
+    def remaining(self):
+        """
+        Returns:
+            float: Seconds until a trial request is allowed, 0 if closed
+        """
+        with self.lock:
+            if self.opened is None:
+                return 0
+            return max(0, self.opened + self.cooldown - time.monotonic())
+
+    def allow(self):
+        """
+        Check whether a request may be sent.
+
+        Returns:
+            bool: False while the circuit is open or a trial is in flight
+        """
+        with self.lock:
+            if self.opened is None:
+                return True
+            if self.trial or time.monotonic() < self.opened+self.cooldown:
+                return False
+            self.trial = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened = None
+            self.trial = False
+            self.cooldown = self.base_cooldown
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial:
+                self.cooldown = min(self.cooldown*2, MAX_COOLDOWN)
+            if self.trial or self.failures >= self.threshold:
+                self.opened = time.monotonic()
+            self.trial = False
+
+def backoff(attempt):
+    """
+    Pick a delay before retrying, with full jitter: a random time up to an
+    exponentially growing, capped limit.
+
+    Parameters:
+        attempt (int): Number of attempts already made, starting at 1
+
+    Returns:
+        float: Seconds to wait
+    """
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2**attempt))
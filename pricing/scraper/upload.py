@@ -0,0 +1,273 @@
+import hashlib
+
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery
+from django.utils import timezone
+
+from pricing.models import BestPrice, Listing, Price
+from pricing.scheduling import schedule
+from products.models import Product, Variant
+
+class BatchUpload:
+    """
+    Collects the parsed information for a batch of listings and writes it to
+    the database in a single transaction with set-based statements.
+
+    Attributes:
+        variants (dictionary): Variant information keyed by listing
+        prices (list): (listing, pricing information) tuples
+        deletions (list): Listings to delete
+        failures (list): Listings which could not be fetched
+        unchanged (set): Listings whose data matches their last upload
+        inserted (int): Prices inserted by the commit
+        extended (int): Current prices extended by the commit
+        stale (set): Products whose best prices need to be recomputed
+        changed (set): Products whose pages were expired by the commit
+    """
+    def __init__(self):
+        """
+        Constructor for the BatchUpload class.
+        """
+        self.variants = {}
+        self.prices = []
+        self.deletions = []
+        self.failures = []
+        self.unchanged = set()
+        self.inserted = 0
+        self.extended = 0
+        self.stale = set()
+        self.changed = set()
+
+    def add_variant(self, listing, variant_info):
+        """
+        Queue updated variant information for a listing.
+
+        Parameters:
+            listing (Listing Object): Listing the information was fetched for
+            variant_info (dictionary): Collection of variant related information
+        """
+        self.variants[listing] = variant_info
+
+    def add_pricing(self, listing, pricing_info):
+        """
+        Queue parsed pricing information for one condition of a listing.
+
+        Parameters:
+            listing (Listing Object): Listing the information was fetched for
+            pricing_info (dictionary): Collection of pricing data items
+        """
+        self.prices.append((listing, pricing_info))
+
+    def add_deletion(self, listing):
+        """
+        Queue a listing which is no longer available for deletion.
+
+        Parameters:
+            listing (Listing Object): Listing to delete
+        """
+        self.deletions.append(listing)
+
+    def add_failure(self, listing):
+        """
+        Record a listing whose item was missing from the response, so that it
+        is retried later.
+
+        Parameters:
+            listing (Listing Object): Listing which could not be fetched
+        """
+        self.failures.append(listing)
+
+    def commit(self):
+        """
+        Write everything queued to the database in one transaction.
+        """
+        now = timezone.now()
+        self.skip_unchanged()
+        with transaction.atomic():
+            self.update_variants()
+            self.update_prices(now)
+            self.update_listings(now)
+            Listing.objects.filter(
+                pk__in=[listing.pk for listing in self.deletions]
+            ).delete()
+            # New prices refresh best prices as they are ingested; extended
+            # prices which changed and deleted listings still need it.
+            self.stale.update(
+                listing.variant.product_id for listing in self.deletions
+            )
+            if self.stale:
+                BestPrice.objects.refresh(self.stale)
+            self.changed |= self.stale
+
+    def skip_unchanged(self):
+        """
+        Fingerprint the data fetched for each listing and drop the variant and
+        price updates of listings whose fingerprint matches the stored one.
+        Those listings are only marked as refreshed.
+        """
+        prices = {}
+        for listing, pricing_info in self.prices:
+            prices.setdefault(listing, []).append(pricing_info)
+        for listing, variant_info in self.variants.items():
+            digest = fingerprint(variant_info, prices.get(listing, []))
+            if digest == listing.fingerprint:
+                self.unchanged.add(listing)
+            listing.fingerprint = digest
+        self.prices = [
+            (listing, pricing_info) for listing, pricing_info in self.prices
+            if listing not in self.unchanged
+        ]
+
+    def update_variants(self):
+        """
+        Send updated variant information to the database. Image, UPC and EAN
+        are only filled in when missing. Product ranks and images are then
+        recomputed, only for products where a variant's rank or image changed.
+        """
+        variants = []
+        products = set()
+        images = set()
+        for listing, variant_info in self.variants.items():
+            if listing in self.unchanged:
+                continue
+            variant = listing.variant
+            if variant.rank != variant_info['rank']:
+                products.add(variant.product_id)
+            if not variant.image and variant_info['image']:
+                images.add(variant.product_id)
+            variant.rank = variant_info['rank']
+            variant.msrp = variant_info['msrp']
+
+            variant.image = variant_info['image'] if not variant.image else variant.image
+            variant.upc = variant_info['upc'] if not variant.upc else variant.upc
+            variant.ean = variant_info['ean'] if not variant.ean else variant.ean
+
+            variants.append(variant)
+
+        Variant.objects.bulk_update(
+            variants, ('rank', 'msrp', 'image', 'upc', 'ean')
+        )
+        Product.objects.filter(pk__in=products).update_ranks()
+        Product.objects.filter(pk__in=images).update_images()
+        self.changed |= images
+
+    def update_prices(self, now):
+        """
+        Extend the current price of each listing and condition when it matches
+        both the new price and the one before it, otherwise ingest the new
+        price as current.
+
+        Parameters:
+            now (datetime): Time to stamp new and extended prices with
+        """
+        last_prices = load_last_prices(
+            {listing.pk for listing, _ in self.prices}
+        )
+        extended = []
+        created = []
+        for listing, pricing_info in self.prices:
+            condition = pricing_info['condition']
+            points = last_prices.get((listing.pk, condition), {})
+            current = points.get(True)
+            previous = points.get(False)
+            if (current and previous and current.total == previous.total == pricing_info['total'] and
+                    current.currency == previous.currency == pricing_info['currency']):
+                if (current.price, current.shipping_type) != (
+                        pricing_info['price'], pricing_info['shipping_type']):
+                    self.stale.add(listing.variant.product_id)
+                for key in ('price', 'shipping', 'shipping_type', 'seller'):
+                    setattr(current, key, pricing_info[key])
+                current.time = now
+                extended.append(current)
+            else:
+                created.append(Price(listing=listing, time=now, **pricing_info))
+
+        Price.objects.bulk_update(
+            extended, ('price', 'shipping', 'shipping_type', 'seller', 'time')
+        )
+        Price.objects.ingest(created)
+        self.changed.update(
+            price.listing.variant.product_id for price in created
+        )
+        self.inserted = len(created)
+        self.extended = len(extended)
+
+    def update_listings(self, now):
+        """
+        Mark fetched listings as refreshed, count failures against the rest,
+        schedule when each should be fetched next, and release their leases.
+
+        Parameters:
+            now (datetime): Time the batch was fetched
+        """
+        refreshed = list(self.variants)
+        for listing in refreshed:
+            listing.new = False
+            listing.failures = 0
+            listing.time = now
+        for listing in self.failures:
+            listing.failures += 1
+
+        listings = refreshed + self.failures
+        for listing in listings:
+            listing.lease_owner = ''
+            listing.lease_expires = None
+        schedule(listings, now)
+        Listing.objects.bulk_update(listings, (
+            'new', 'failures', 'time', 'next_fetch', 'fingerprint',
+            'lease_owner', 'lease_expires'
+        ))
+
+def fingerprint(variant_info, prices):
+    """
+    Hash the fields stored for a listing, so a later fetch returning the same
+    data can be recognised without comparing against the database.
+
+    Parameters:
+        variant_info (dictionary): Collection of variant related information
+        prices (list): Pricing information of each condition
+
+    Returns:
+        string: Hex digest of the data
+    """
+    data = (
+        sorted(variant_info.items()),
+        sorted(sorted(pricing_info.items()) for pricing_info in prices)
+    )
+    return hashlib.sha1(repr(data).encode('utf-8')).hexdigest()
+
+def load_last_prices(listing_ids):
+    """
+    Load the current price of every condition of the given listings, and the
+    latest retired price before it, with a single query. Both are index
+    seeks per listing and condition, so the cost does not grow with the
+    length of their price history.
+
+    Parameters:
+        listing_ids (iterable): Primary keys of the listings
+
+    Returns:
+        dictionary: Prices keyed by (listing id, condition), then is_current
+    """
+    # Naming every condition lets the (listing, condition,
+    # is_current, time) index be seeked instead of scanned per listing.
+    current = Price.objects.filter(
+        listing_id__in=listing_ids, is_current=True,
+        condition__in=[condition for condition, _ in Price.CONDITIONS]
+    )
+    previous = Price.objects.filter(
+        listing=OuterRef('listing'), condition=OuterRef('condition'),
+        is_current=False
+    ).order_by('-time', '-pk').values('pk')[:1]
+    prices = Price.objects.filter(
+        Q(pk__in=current.values('pk')) |
+        Q(pk__in=current.annotate(previous=Subquery(previous)).values(
+            'previous'
+        ))
+    )
+
+    last_prices = {}
+    for price in prices:
+        key = (price.listing_id, price.condition)
+        last_prices.setdefault(key, {})[price.is_current] = price
+    return last_prices
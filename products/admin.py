@@ -9,7 +9,9 @@ from .forms import CategoryForm, ProductForm
 
 class VariantInline(admin.StackedInline):
     model = Variant
-    exclude = ('slug', 'ean', 'upc')
+    exclude = (
+        'slug', 'ean', 'upc', 'image_source', 'image_card', 'image_detail'
+    )
     extra = 1
     fk = 'product'
     show_change_link = True
@@ -29,7 +31,9 @@ class ProductAdmin(admin.ModelAdmin):
 class VariantAdmin(admin.ModelAdmin):
     model = Variant
     inlines = [ListingInline]
-    exclude = ('slug', 'ean', 'upc')
+    exclude = (
+        'slug', 'ean', 'upc', 'image_source', 'image_card', 'image_detail'
+    )
     search_fields = ('product__manufacturer__name', 'product__name', 'name')
 
 admin.site.register(Category, CategoryAdmin)
@@ -0,0 +1,52 @@
+from django.core.cache import cache
+
+# Cards are invalidated when their product changes, the timeout only bounds
+# how long a card built from a read racing with a write can stay stale.
+CARD_TIMEOUT = 60 * 60
+
+def card_key(product_id):
+    return 'product-card:%d' % product_id
+
+def get_cards(product_ids, build):
+    """
+    Look up the cards of products in the cache with a single get_many, and
+    build and cache the missing ones together.
+
+    Parameters:
+        product_ids (list): Primary keys of the products, in display order
+        build (function): Takes a list of primary keys and returns the cards
+            of those products keyed by primary key
+
+    Returns:
+        list: Cards in the order of product_ids, skipping products which no
+            longer exist
+    """
+    product_ids = list(product_ids)
+    keys = {product_id: card_key(product_id) for product_id in product_ids}
+    cached = cache.get_many(keys.values())
+    cards = {
+        product_id: cached[key] for product_id, key in keys.items()
+        if key in cached
+    }
+    missing = [
+        product_id for product_id in product_ids if product_id not in cards
+    ]
+    if missing:
+        built = build(missing)
+        cache.set_many({
+            keys[product_id]: card for product_id, card in built.items()
+        }, CARD_TIMEOUT)
+        cards.update(built)
+    return [cards[product_id] for product_id in product_ids
+            if product_id in cards]
+
+def invalidate_cards(product_ids):
+    """
+    Drop the cached cards of products, so they are rebuilt on next use.
+
+    Parameters:
+        product_ids (iterable): Primary keys of the products
+    """
+    keys = [card_key(product_id) for product_id in product_ids]
+    if keys:
+        cache.delete_many(keys)
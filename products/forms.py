@@ -11,7 +11,7 @@ class CategoryForm(forms.ModelForm):
 
     class Meta:
         model = Category
-        exclude = ('slug',)
+        exclude = ('slug', 'image_card')
 
 class ProductForm(forms.ModelForm):
     category = TreeNodeChoiceField(queryset=Category.objects.all())
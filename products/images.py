@@ -0,0 +1,100 @@
+import io
+import hashlib
+
+from PIL import Image
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+SIZES = {'card': (230, 230), 'detail': (600, 360)}
+QUALITY = 85
+MAX_SOURCE_BYTES = 10 * 1024 * 1024
+TIMEOUT = (5, 30)
+
+def render_derivative(source, size):
+    """
+    Resize an image to fit within a size and encode it as a progressive
+    JPEG. Transparent areas are flattened onto white, the background the
+    cards are drawn on.
+
+    Parameters:
+        source (Image): Decoded source image
+        size (tuple): Maximum width and height in pixels
+
+    Returns:
+        bytes: Encoded JPEG
+    """
+    image = source.copy()
+    image.thumbnail(size, Image.LANCZOS)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        image = background
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    output = io.BytesIO()
+    image.save(
+        output, 'JPEG', quality=QUALITY, optimize=True, progressive=True
+    )
+    return output.getvalue()
+
+def store(data, size_name):
+    """
+    Save an encoded derivative under a name derived from its content, so
+    identical images are stored once and a name never changes meaning.
+
+    Parameters:
+        data (bytes): Encoded JPEG
+        size_name (string): Key of the size in SIZES
+
+    Returns:
+        string: Storage name of the derivative
+    """
+    digest = hashlib.sha1(data).hexdigest()[:20]
+    name = 'images/%s/%s.jpg' % (size_name, digest)
+    if not default_storage.exists(name):
+        saved = default_storage.save(name, ContentFile(data))
+        # Another worker stored the same image first, and storage picked a
+        # new name for this copy.
+        if saved != name:
+            default_storage.delete(saved)
+    return name
+
+def create_derivatives(source, sizes=SIZES):
+    """
+    Render and store every derivative of an image.
+
+    Parameters:
+        source (file object): Source image data
+        sizes (dictionary): Maximum (width, height) keyed by size name
+
+    Returns:
+        dictionary: Storage name of each derivative keyed by size name
+    """
+    image = Image.open(source)
+    image.load()
+    return {
+        size_name: store(render_derivative(image, size), size_name)
+        for size_name, size in sizes.items()
+    }
+
+def fetch_image(url, session):
+    """
+    Download a remote image.
+
+    Parameters:
+        url (string): Image URL
+        session (Session): HTTP session to download with
+
+    Returns:
+        BytesIO: Image data
+    """
+    with session.get(url, stream=True, timeout=TIMEOUT) as response:
+        response.raise_for_status()
+        data = response.raw.read(MAX_SOURCE_BYTES + 1, decode_content=True)
+    if len(data) > MAX_SOURCE_BYTES:
+        raise ValueError('Image larger than %d bytes: %s' % (
+            MAX_SOURCE_BYTES, url
+        ))
+    return io.BytesIO(data)
@@ -0,0 +1,93 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from products.images import create_derivatives, fetch_image
+from products.models import Category, Product, Variant
+
+logger = logging.getLogger(__name__)
+
+def process_image(url, session):
+    """
+    Download an image and store its derivatives.
+
+    Parameters:
+        url (string): Image URL
+        session (Session): HTTP session to download with
+
+    Returns:
+        dictionary: Storage name of each derivative keyed by size name
+    """
+    return create_derivatives(fetch_image(url, session))
+
+class Command(BaseCommand):
+    help = (
+        'Download variant images which changed since they were last '
+        'processed, and store card and detail sized copies of them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='regenerate every variant image, not only changed ones'
+        )
+        parser.add_argument(
+            '--categories', action='store_true',
+            help='also regenerate the card images of categories'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=4,
+            help='number of images processed at once'
+        )
+
+    def handle(self, *args, **options):
+        if options['categories']:
+            for category in Category.objects.exclude(image='').exclude(
+                    image=None):
+                category.update_image_card()
+            self.stdout.write('Regenerated category images.')
+
+        variants = Variant.objects.exclude(image='').exclude(image=None)
+        if not options['all']:
+            variants = variants.exclude(image_source=F('image'))
+
+        # Variants sharing an image URL are processed together, so each
+        # image is only downloaded once.
+        urls = {}
+        for variant in variants.only('image', 'product'):
+            urls.setdefault(variant.image, []).append(variant)
+
+        updated = []
+        failed = 0
+        session = requests.Session()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            futures = {
+                pool.submit(process_image, url, session): url for url in urls
+            }
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    names = future.result()
+                except Exception:
+                    logger.warning('Could not process %s', url, exc_info=True)
+                    failed += 1
+                    continue
+                for variant in urls[url]:
+                    variant.image_source = url
+                    variant.image_card = names['card']
+                    variant.image_detail = names['detail']
+                    updated.append(variant)
+
+        Variant.objects.bulk_update(
+            updated, ('image_source', 'image_card', 'image_detail'),
+            batch_size=100
+        )
+        Product.objects.filter(
+            pk__in={variant.product_id for variant in updated}
+        ).update_images()
+        self.stdout.write('Processed %d images for %d variants, %d failed.' % (
+            len(urls) - failed, len(updated), failed
+        ))
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.13 on 2026-10-18 13:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_auto_20191014_1409'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='image_card',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='variant',
+            name='image_card',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='variant',
+            name='image_detail',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='variant',
+            name='image_source',
+            field=models.URLField(blank=True, max_length=255),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 2.2.13 on 2026-10-18 13:17
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def set_product_images(apps, schema_editor):
+    """
+    Copy the image of each product's first variant with one to the product.
+    """
+    Product = apps.get_model('products', 'Product')
+    Variant = apps.get_model('products', 'Variant')
+    first = Variant.objects.filter(
+        product=models.OuterRef('pk')
+    ).exclude(image=None).exclude(image='').order_by('name')
+    Product.objects.update(
+        image=models.Subquery(first.values('image')[:1]),
+        image_card=Coalesce(
+            models.Subquery(first.values('image_card')[:1]), models.Value('')
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_images'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image',
+            field=models.URLField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='image_card',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.RunPython(set_product_images, migrations.RunPython.noop),
+    ]
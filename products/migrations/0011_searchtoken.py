@@ -0,0 +1,57 @@
+# Generated by Django 2.2.13 on 2026-10-18 13:27
+
+import re
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def tokenize(text):
+    words = re.findall(r'[^\W_]+', text.lower().replace('+', ' plus '))
+    return [word[:50] for word in words]
+
+
+def create_search_tokens(apps, schema_editor):
+    """
+    Index every product by its category slug, manufacturer and name.
+    """
+    Product = apps.get_model('products', 'Product')
+    SearchToken = apps.get_model('products', 'SearchToken')
+    tokens = []
+    for product in Product.objects.select_related('category', 'manufacturer'):
+        weights = dict.fromkeys(tokenize(product.category.slug), 1)
+        weights.update(dict.fromkeys(tokenize('%s %s' % (
+            product.manufacturer.name, product.name
+        )), 2))
+        tokens.extend(
+            SearchToken(product=product, token=token, weight=weight)
+            for token, weight in weights.items()
+        )
+    SearchToken.objects.bulk_create(tokens)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_product_image'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='product',
+            name='search',
+        ),
+        migrations.CreateModel(
+            name='SearchToken',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(db_index=True, max_length=50)),
+                ('weight', models.PositiveSmallIntegerField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='products.Product')),
+            ],
+            options={
+                'unique_together': {('product', 'token')},
+            },
+        ),
+        migrations.RunPython(create_search_tokens, migrations.RunPython.noop),
+    ]
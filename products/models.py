@@ -1,11 +1,84 @@
 import os
+import re
+import operator
+from functools import reduce
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 from django.utils.text import slugify
 from django.utils.deconstruct import deconstructible
 
 from mptt.models import MPTTModel, TreeForeignKey
 
+from .cards import get_cards, invalidate_cards
+from .images import SIZES, create_derivatives
+from .pagecache import expire_pages
+
+TOKEN_LENGTH = 50
+NAME_WEIGHT = 2
+CATEGORY_WEIGHT = 1
+
+def tokenize(text):
+    """
+    Split text into the lowercase words products are indexed and searched
+    by.
+
+    Parameters:
+        text (string): Text to split
+
+    Returns:
+        list: Tokens in the order they appear
+    """
+    words = re.findall(r'[^\W_]+', text.lower().replace('+', ' plus '))
+    return [word[:TOKEN_LENGTH] for word in words]
+
+def search_terms(query):
+    """
+    Split a search query into its distinct terms.
+
+    Parameters:
+        query (string): Words to search for
+
+    Returns:
+        list: Tokens in the order they first appear
+    """
+    return list(dict.fromkeys(tokenize(query)))
+
+def category_scopes(categories):
+    """
+    Name the page cache scopes of categories and of every category above
+    them.
+
+    Parameters:
+        categories (QuerySet): Categories to name the scopes of
+
+    Returns:
+        list: Names of the scopes
+    """
+    return ['category:%s' % slug for slug in (
+        Category.objects.get_queryset_ancestors(
+            categories, include_self=True
+        ).values_list('slug', flat=True)
+    )]
+
+def token_prefix(term, field='token'):
+    """
+    Match tokens starting with a term. Range lookups rather than startswith,
+    so every backend can answer them from the token index.
+
+    Parameters:
+        term (string): Start of the tokens
+        field (string): Lookup path of the token field
+
+    Returns:
+        Q: Filter matching the tokens
+    """
+    return models.Q(**{
+        '%s__gte' % field: term, '%s__lt' % field: term + '\uffff'
+    })
+
 @deconstructible
 class PathAndRename:
     def __init__(self, sub_path):
@@ -22,6 +95,7 @@ class Category(MPTTModel):
     image = models.ImageField(
         upload_to=PathAndRename('categories/'), blank=True, null=True
     )
+    image_card = models.CharField(max_length=255, blank=True)
     parent = TreeForeignKey(
         'self', blank=True, null=True, related_name='children',
         db_index=True, on_delete=models.CASCADE
@@ -38,7 +112,41 @@ class Category(MPTTModel):
             self.slug = '%s-%s' % (self.parent.slug, slugify(self.name))
         else:
             self.slug = slugify(self.name)
+        uploaded = bool(self.image) and not self.image._committed
+        previous = None
+        if not self._state.adding:
+            previous = Category.objects.filter(pk=self.pk).values_list(
+                'parent', flat=True
+            ).first()
+        moved = self._state.adding or previous != self.parent_id
         super(Category, self).save(*args, **kwargs)
+        if moved:
+            # The pages of the categories above list their children.
+            scopes = ['products'] + category_scopes(
+                Category.objects.filter(pk__in=[self.pk, previous])
+            )
+            transaction.on_commit(lambda: expire_pages(scopes))
+        if uploaded or not self.image and self.image_card:
+            self.update_image_card()
+        # Product cards show the name of their root category.
+        products = Product.objects.filter(
+            category__in=self.get_descendants(include_self=True)
+        )
+        products.update_search()
+        products.invalidate_cache()
+
+    def update_image_card(self):
+        """
+        Regenerate the card-sized derivative of the category image.
+        """
+        if self.image:
+            with self.image.open('rb') as source:
+                self.image_card = create_derivatives(
+                    source, {'card': SIZES['card']}
+                )['card']
+        else:
+            self.image_card = ''
+        Category.objects.filter(pk=self.pk).update(image_card=self.image_card)
 
     def __str__(self):
         return self.name
@@ -53,10 +161,196 @@ class Manufacturer(models.Model):
     def save(self, *args, **kwargs):
         self.slug = slugify(self.name)
         super(Manufacturer, self).save(*args, **kwargs)
+        self.product_set.all().update_search()
+        self.product_set.all().invalidate_cache()
 
     def __str__(self):
         return self.name
 
+class ProductQuerySet(models.QuerySet):
+    def update_ranks(self):
+        """
+        Set the rank of every product in the queryset to the best rank of its
+        variants, in a single UPDATE.
+
+        Returns:
+            int: Number of products updated
+        """
+        best = Variant.objects.filter(
+            product=models.OuterRef('pk')
+        ).order_by().values('product').annotate(
+            best=models.Min('rank')
+        ).values('best')
+        return self.update(rank=models.Subquery(best))
+
+    def update_images(self):
+        """
+        Set the image of every product in the queryset to the image of its
+        first variant which has one, in a single UPDATE.
+
+        Returns:
+            int: Number of products updated
+        """
+        first = Variant.objects.filter(
+            product=models.OuterRef('pk')
+        ).exclude(image=None).exclude(image='').order_by('name')
+        product_ids = list(self.values_list('pk', flat=True))
+        updated = self.update(
+            image=models.Subquery(first.values('image')[:1]),
+            image_card=Coalesce(
+                models.Subquery(first.values('image_card')[:1]),
+                models.Value('')
+            )
+        )
+        self.model.objects.filter(pk__in=product_ids).invalidate_cache()
+        return updated
+
+    def invalidate_cache(self):
+        """
+        Drop the cached cards and pages of the products once the current
+        transaction commits. Until then, a page view would read the rows
+        being replaced and cache them again.
+        """
+        product_ids = list(self.values_list('pk', flat=True))
+        transaction.on_commit(lambda: invalidate_cards(product_ids))
+        transaction.on_commit(lambda: self.model.objects.filter(
+            pk__in=product_ids
+        ).expire_pages())
+
+    def with_best_prices(self):
+        """
+        Join the best price of each condition to the products, annotating
+        them with <condition>_price and <condition>_shipping.
+
+        Returns:
+            QuerySet: Annotated products
+        """
+        relations = {}
+        fields = {}
+        for condition in ('new', 'used', 'refurb'):
+            relation = 'best_%s' % condition
+            relations[relation] = models.FilteredRelation(
+                'best_prices',
+                condition=models.Q(best_prices__condition=condition)
+            )
+            fields['%s_price' % condition] = models.F('%s__price' % relation)
+            fields['%s_shipping' % condition] = models.F(
+                '%s__shipping_type' % relation
+            )
+        return self.annotate(**relations).annotate(**fields)
+
+    def build_cards(self):
+        """
+        Build the data shown on the product cards of list pages, in a single
+        query.
+
+        Returns:
+            dictionary: Cards keyed by product primary key
+        """
+        root = Category.objects.filter(
+            tree_id=models.OuterRef('category__tree_id'), level=0
+        ).values('name')[:1]
+        products = self.order_by().with_best_prices().annotate(
+            manufacturer_name=models.F('manufacturer__name'),
+            root_category=models.Subquery(root)
+        ).values(
+            'pk', 'name', 'slug', 'image', 'image_card', 'manufacturer_name',
+            'root_category', 'new_price', 'new_shipping', 'used_price',
+            'used_shipping', 'refurb_price', 'refurb_shipping'
+        )
+        return {product.pop('pk'): product for product in products}
+
+    def expire_pages(self):
+        """
+        Expire the cached pages showing the products: their own pages, the
+        pages of their categories and those above, and the pages which may
+        list any product.
+        """
+        products = list(self.order_by().values_list('slug', 'category'))
+        scopes = ['products']
+        scopes.extend('product:%s' % slug for slug, _ in products)
+        scopes.extend(category_scopes(Category.objects.filter(
+            pk__in={category for _, category in products}
+        )))
+        expire_pages(scopes)
+
+    def update_search(self):
+        """
+        Rebuild the search tokens of every product in the queryset from its
+        category slug, manufacturer and name, in three statements.
+        """
+        product_ids = []
+        tokens = []
+        for product in self.select_related('category', 'manufacturer'):
+            product_ids.append(product.pk)
+            weights = dict.fromkeys(
+                tokenize(product.category.slug), CATEGORY_WEIGHT
+            )
+            weights.update(dict.fromkeys(tokenize('%s %s' % (
+                product.manufacturer.name, product.name
+            )), NAME_WEIGHT))
+            tokens.extend(
+                SearchToken(product=product, token=token, weight=weight)
+                for token, weight in weights.items()
+            )
+        with transaction.atomic():
+            SearchToken.objects.filter(product__in=product_ids).delete()
+            SearchToken.objects.bulk_create(tokens)
+
+    def search(self, query):
+        """
+        Filter the queryset down to products with a search token starting
+        with each word of a query, best matches first. A word counts for the
+        weight of the best token it matches, plus one when it matches the
+        whole token; equally relevant products are ordered by rank.
+
+        Parameters:
+            query (string): Words to search for
+
+        Returns:
+            QuerySet: Matching products, annotated with their relevance
+        """
+        terms = search_terms(query)
+        if not terms:
+            return self.none()
+        prefixes = [
+            token_prefix(term, 'search_tokens__token') for term in terms
+        ]
+        scores = {}
+        for index, (term, prefix) in enumerate(zip(terms, prefixes)):
+            scores['term_%d' % index] = models.Max(models.Case(
+                models.When(
+                    search_tokens__token=term,
+                    then=models.F('search_tokens__weight') + 1
+                ),
+                models.When(prefix, then=models.F('search_tokens__weight')),
+                default=0, output_field=models.IntegerField()
+            ))
+        return self.filter(reduce(operator.or_, prefixes)).annotate(
+            **scores
+        ).filter(**{
+            '%s__gt' % name: 0 for name in scores
+        }).annotate(
+            relevance=reduce(operator.add, map(models.F, scores))
+        ).order_by('-relevance', models.F('rank').asc(nulls_last=True), 'pk')
+
+class ProductManager(models.Manager.from_queryset(ProductQuerySet)):
+    def cards(self, product_ids):
+        """
+        Get the cards of products, from the cache where possible.
+
+        Parameters:
+            product_ids (iterable): Primary keys of the products, in display
+                order
+
+        Returns:
+            list: Cards in the order of product_ids
+        """
+        return get_cards(
+            product_ids,
+            lambda missing: self.filter(pk__in=missing).build_cards()
+        )
+
 class Product(models.Model):
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
     manufacturer = models.ForeignKey(Manufacturer, on_delete=models.CASCADE)
@@ -64,7 +358,10 @@ class Product(models.Model):
     slug = models.CharField(max_length=255, unique=True)
     rank = models.PositiveIntegerField(blank=True, null=True)
     discount = models.FloatField(blank=True, null=True)
-    search = models.TextField(blank=True, null=True)
+    image = models.URLField(max_length=255, blank=True, null=True)
+    image_card = models.CharField(max_length=255, blank=True)
+
+    objects = ProductManager()
 
     class Meta:
         ordering = ['manufacturer', 'name']
@@ -73,10 +370,10 @@ class Product(models.Model):
         self.slug = '%s-%s' % (
             self.manufacturer.slug, slugify(self.name.replace('+', ' plus'))
         )
-        self.search = []
-        self.search.extend(self.category.slug.split('-'))
-        self.search.extend(self.slug.split('-'))
         super(Product, self).save(*args, **kwargs)
+        products = Product.objects.filter(pk=self.pk)
+        products.update_search()
+        products.invalidate_cache()
 
     def __str__(self):
         return '%s %s' % (self.manufacturer.name, self.name)
@@ -92,6 +389,9 @@ class Variant(models.Model):
         max_digits=8, decimal_places=2, blank=True, null=True
     )
     image = models.URLField(max_length=255, blank=True, null=True)
+    image_source = models.URLField(max_length=255, blank=True)
+    image_card = models.CharField(max_length=255, blank=True)
+    image_detail = models.CharField(max_length=255, blank=True)
     rank = models.PositiveIntegerField(blank=True, null=True)
 
     class Meta:
@@ -99,16 +399,43 @@ class Variant(models.Model):
         unique_together = ('product', 'name')
 
     def save(self, *args, **kwargs):
-        if self.rank:
-            rank = Variant.objects.filter(
-                product=self.product
-            ).aggregate(models.Min('rank'))
-            self.product.rank = rank['rank__min']
-            self.product.save()
         self.slug = slugify(self.name.replace('+', ' plus'))
         super(Variant, self).save(*args, **kwargs)
+        products = Product.objects.filter(pk=self.product_id)
+        products.update_ranks()
+        products.update_images()
 
     def __str__(self):
         return '%s %s: %s' % (
             self.product.manufacturer.name, self.product.name, self.name
         )
+
+class SearchToken(models.Model):
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name='search_tokens'
+    )
+    token = models.CharField(max_length=TOKEN_LENGTH, db_index=True)
+    weight = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = ('product', 'token')
+
+    def __str__(self):
+        return self.token
+
+# Deleted products and categories drop out of the pages listing them. The
+# scopes are named straight away, as the categories above may be deleted
+# next in the same cascade.
+@receiver(post_delete, sender=Product)
+def expire_deleted_product(sender, instance, **kwargs):
+    scopes = ['products', 'product:%s' % instance.slug] + category_scopes(
+        Category.objects.filter(pk=instance.category_id)
+    )
+    transaction.on_commit(lambda: expire_pages(scopes))
+
+@receiver(post_delete, sender=Category)
+def expire_deleted_category(sender, instance, **kwargs):
+    scopes = ['products', 'category:%s' % instance.slug] + category_scopes(
+        Category.objects.filter(pk=instance.parent_id)
+    )
+    transaction.on_commit(lambda: expire_pages(scopes))
@@ -0,0 +1,160 @@
+import uuid
+import hashlib
+import threading
+from functools import wraps
+from contextlib import contextmanager
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache, caches
+from django.http import Http404, HttpResponse
+from django.test import RequestFactory
+from django.urls import resolve
+
+# Pages are expired by bumping the versions of their scopes, which leaves
+# the pages of the old versions to time out unread. They are kept in their
+# own small cache so they are culled quickly, while the versions stay in
+# the default cache. The timeout also bounds how long changes which bump
+# nothing take to show.
+PAGE_CACHE = 'pages'
+PAGE_TIMEOUT = 10 * 60
+ORIGINS_KEY = 'page-origins'
+
+deferred = threading.local()
+
+def version_key(scope):
+    return 'page-version:%s' % scope
+
+def get_versions(scopes):
+    """
+    Look up the current versions of scopes, starting a new version for any
+    scope which has none. A version which was evicted is never reused, so
+    pages cached under it cannot come back.
+
+    Parameters:
+        scopes (list): Names of the scopes
+
+    Returns:
+        list: Versions in the order of scopes
+    """
+    keys = [version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            version = uuid.uuid4().hex
+            if not cache.add(key, version, None):
+                version = cache.get(key, version)
+            versions[key] = version
+    return [versions[key] for key in keys]
+
+def expire_pages(scopes):
+    """
+    Drop the versions of scopes. Their next lookup starts new versions, so
+    every cached page depending on them is rendered again on its next visit.
+
+    Parameters:
+        scopes (iterable): Names of the scopes
+    """
+    collected = getattr(deferred, 'scopes', None)
+    if collected is not None:
+        collected.update(scopes)
+        return
+    keys = [version_key(scope) for scope in scopes]
+    if keys:
+        cache.delete_many(keys)
+
+@contextmanager
+def defer_expiry(scopes):
+    """
+    Collect the scopes expired on this thread within the block instead of
+    expiring them, so a caller making many changes can expire them all
+    at once later.
+
+    Parameters:
+        scopes (set): Set the scopes are added to
+    """
+    deferred.scopes = scopes
+    try:
+        yield scopes
+    finally:
+        del deferred.scopes
+
+def page_key(request, versions):
+    url = '%s|%s' % (request.build_absolute_uri(), '|'.join(versions))
+    return 'page:%s' % hashlib.md5(url.encode('utf-8')).hexdigest()
+
+def remember_origin(request):
+    """
+    Record the scheme and host a page was visited on, so warm_pages can
+    render pages the way visitors request them.
+    """
+    origin = (request.is_secure(), request.get_host())
+    origins = cache.get(ORIGINS_KEY, set())
+    if origin not in origins:
+        cache.set(ORIGINS_KEY, origins | {origin}, None)
+
+def cache_page(scopes):
+    """
+    Cache the pages a view renders for anonymous visitors, keyed on their
+    URL and the versions of the scopes they depend on.
+
+    Parameters:
+        scopes (function): Takes the arguments of the view from the URL and
+            returns the names of the scopes its page depends on
+
+    Returns:
+        function: View decorator
+    """
+    def decorator(view):
+        @wraps(view)
+        def cached_view(request, *args, **kwargs):
+            if (request.method not in ('GET', 'HEAD') or
+                    request.user.is_authenticated):
+                return view(request, *args, **kwargs)
+
+            key = page_key(request, get_versions(scopes(*args, **kwargs)))
+            page = caches[PAGE_CACHE].get(key)
+            if page is not None:
+                content, content_type = page
+                return HttpResponse(content, content_type=content_type)
+
+            response = view(request, *args, **kwargs)
+            # Pages which set cookies or carry a CSRF token belong to a
+            # single visitor.
+            if (response.status_code == 200 and not response.streaming and
+                    not response.cookies and
+                    not request.META.get('CSRF_COOKIE_USED')):
+                caches[PAGE_CACHE].set(
+                    key, (response.content, response['Content-Type']),
+                    PAGE_TIMEOUT
+                )
+                remember_origin(request)
+            return response
+        return cached_view
+    return decorator
+
+def warm_pages(paths):
+    """
+    Render pages for anonymous visitors on every scheme and host they have
+    been visited on, so the next visits are served from the cache. Pages
+    which are cached already are left alone.
+
+    Parameters:
+        paths (iterable): Paths of the pages
+
+    Returns:
+        int: Number of pages requested
+    """
+    factory = RequestFactory()
+    origins = cache.get(ORIGINS_KEY, set())
+    requested = 0
+    for path in paths:
+        match = resolve(path)
+        for secure, host in origins:
+            request = factory.get(path, secure=secure, HTTP_HOST=host)
+            request.user = AnonymousUser()
+            try:
+                match.func(request, *match.args, **match.kwargs)
+            except Http404:
+                pass
+            requested += 1
+    return requested
@@ -0,0 +1,208 @@
+import json
+import base64
+import binascii
+import operator
+from functools import reduce
+
+from django.db.models import F, Q
+from django.utils.functional import cached_property
+
+class KeysetPage:
+    """
+    A page of primary keys, with the cursors of the pages around it.
+
+    Attributes:
+        object_list (list): Primary keys on the page
+        number (int): Position of the page, counting from 1
+        num_pages (int): Number of pages
+        previous_cursor (string): Cursor of the previous page, '' for the
+            first page, or None if there is no previous page
+        next_cursor (string): Cursor of the next page, or None
+        last_cursor (string): Cursor of the last page
+    """
+    def __init__(self, object_list, number, num_pages, previous_cursor,
+                 next_cursor, last_cursor):
+        """
+        Constructor for the KeysetPage class.
+        """
+        self.object_list = object_list
+        self.number = number
+        self.num_pages = num_pages
+        self.previous_cursor = previous_cursor
+        self.next_cursor = next_cursor
+        self.last_cursor = last_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+class KeysetPaginator:
+    """
+    Pages through a queryset by seeking past the sort keys of the last row
+    shown, so a deep page costs as much as the first one instead of making
+    the database skip every row before it. Keys sort with None last, and
+    must end with the primary key so every row has a distinct position.
+
+    Cursors are opaque strings carrying the direction to read in, the
+    number of the page they lead to and the keys to seek from.
+
+    Attributes:
+        queryset (QuerySet): Rows to page through
+        per_page (int): Rows per page
+        keys (tuple): (field name, descending) pairs the rows are sorted by
+    """
+    def __init__(self, queryset, per_page, keys, count=None):
+        """
+        Constructor for the KeysetPaginator class.
+
+        Parameters:
+            queryset (QuerySet): Rows to page through
+            per_page (int): Rows per page
+            keys (tuple): (field name, descending) pairs the rows are
+                sorted by, ending with ('pk', False)
+            count (int): Number of rows, if already known
+        """
+        self.queryset = queryset
+        self.per_page = per_page
+        self.keys = keys
+        if count is not None:
+            self.count = count
+
+    @cached_property
+    def count(self):
+        return self.queryset.count()
+
+    @property
+    def num_pages(self):
+        return max(1, -(-self.count // self.per_page))
+
+    def encode(self, direction, number, values=()):
+        data = json.dumps([direction, number] + list(values))
+        return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii')
+
+    def decode(self, cursor):
+        """
+        Unpack a cursor, treating anything malformed as the first page.
+
+        Returns:
+            tuple: Direction, page number and key values
+        """
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            direction, number = data[:2]
+            values = data[2:]
+        except (AttributeError, ValueError, TypeError, binascii.Error):
+            return 'next', 1, None
+        if (direction not in ('next', 'previous', 'last') or
+                not isinstance(number, int) or number < 1 or
+                direction != 'last' and len(values) != len(self.keys) or
+                not all(isinstance(value, (int, float, str, type(None)))
+                        for value in values)):
+            return 'next', 1, None
+        return direction, number, values or None
+
+    def ordering(self, reverse=False):
+        ordering = []
+        for name, descending in self.keys:
+            field = F(name)
+            order = field.desc if descending != reverse else field.asc
+            ordering.append(order(nulls_first=reverse, nulls_last=not reverse))
+        return ordering
+
+    def seek(self, values, reverse=False):
+        """
+        Build a filter for the rows after some key values in sort order, or
+        before them when reverse is set.
+
+        Parameters:
+            values (list): Key values to seek from
+            reverse (bool): Whether to seek backwards
+
+        Returns:
+            Q: Filter matching the rows
+        """
+        conditions = []
+        equal = Q()
+        for (name, descending), value in zip(self.keys, values):
+            if value is None:
+                # None sorts last: nothing comes after it, everything else
+                # comes before.
+                if reverse:
+                    conditions.append(
+                        equal & Q(**{'%s__isnull' % name: False})
+                    )
+                equal &= Q(**{'%s__isnull' % name: True})
+                continue
+            lookup = 'lt' if descending != reverse else 'gt'
+            beyond = Q(**{'%s__%s' % (name, lookup): value})
+            if not reverse:
+                beyond |= Q(**{'%s__isnull' % name: True})
+            conditions.append(equal & beyond)
+            equal &= Q(**{name: value})
+        return reduce(operator.or_, conditions, Q(pk__in=[]))
+
+    def page(self, cursor):
+        """
+        Get the page a cursor leads to.
+
+        Parameters:
+            cursor (string): Cursor from a previous page, or None for the
+                first page
+
+        Returns:
+            KeysetPage: The page
+        """
+        direction, number, values = self.decode(cursor)
+        if not self.count:
+            return KeysetPage([], 1, 1, None, None, self.encode('last', 1))
+        names = [name for name, _ in self.keys]
+        queryset = self.queryset.values_list(*names)
+        if direction == 'last':
+            number = self.num_pages
+            size = self.count - (number - 1) * self.per_page
+            rows = list(queryset.order_by(*self.ordering(True))[:size or 1])
+            rows.reverse()
+            has_previous = number > 1
+            has_next = False
+        elif direction == 'previous':
+            rows = list(queryset.filter(
+                self.seek(values, reverse=True)
+            ).order_by(*self.ordering(True))[:self.per_page + 1])
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            rows.reverse()
+            has_next = True
+            if not has_previous:
+                number = 1
+        else:
+            if values is not None:
+                queryset = queryset.filter(self.seek(values))
+            rows = list(
+                queryset.order_by(*self.ordering())[:self.per_page + 1]
+            )
+            has_previous = values is not None
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+
+        previous_cursor = next_cursor = None
+        if has_previous and rows:
+            previous_cursor = '' if number <= 2 else self.encode(
+                'previous', number - 1, rows[0]
+            )
+        elif has_previous:
+            previous_cursor = ''
+        if has_next and rows:
+            next_cursor = self.encode('next', number + 1, rows[-1])
+        return KeysetPage(
+            [row[-1] for row in rows], number,
+            max(self.num_pages, number), previous_cursor, next_cursor,
+            self.encode('last', self.num_pages)
+        )
@@ -1,9 +1,17 @@
 $(function() {
-  // price history chart
-  var ctx = document.getElementById('price-history').getContext('2d');
+  // price history chart, loaded after the page with about a point per pixel
+  var canvas = $('#price-history');
+  var points = Math.ceil(canvas.parent().width() / 100) * 100;
+  $.getJSON(canvas.data('url'), {points: points}, function(data) {
+    drawPriceHistory(canvas[0], data.datasets);
+  });
+});
+
+function drawPriceHistory(canvas, datasets) {
+  var ctx = canvas.getContext('2d');
   var priceHistory = new Chart(ctx, {
     type: 'line',
-    data: {datasets: price_history},
+    data: {datasets: datasets},
     options: {
       color: 'white',
       legend: {position: 'bottom'},
@@ -42,4 +50,4 @@ $(function() {
       }
     }
   });
-});
+}
@@ -1,4 +1,5 @@
 from django import template
+from django.urls import reverse
 
 from urllib.parse import urlencode
 
@@ -7,11 +8,17 @@ register = template.Library()
 @register.simple_tag
 def replace_param(request, field, value):
     params = request.GET.copy()
-    if 'page' in params:
-        del params['page']
-    params[field] = value
+    for param in ('page', 'cursor'):
+        if param in params:
+            del params[param]
+    if value != '':
+        params[field] = value
     return params.urlencode()
 
+@register.filter
+def image_url(name):
+    return reverse('image', kwargs={'name': name})
+
 @register.filter
 def format_price(value):
     return '${:,.2f}'.format(value)
@@ -8,4 +8,8 @@ urlpatterns = [
     url(r'^product/(?P<slug>[\w-]{3,255})/$', views.product, name='product'),
     url(r'^product/(?P<product>[\w-]{3,255})/(?P<variant>[\w-]{3,255})/$',
         views.variant, name='variant'),
+    url(r'^product/(?P<product>[\w-]{3,255})/(?P<variant>[\w-]{3,255})/'
+        r'history/$', views.variant_history, name='variant_history'),
+    url(r'^(?P<name>images/(?:card|detail)/[0-9a-f]{20}\.jpg)$', views.image,
+        name='image'),
 ]
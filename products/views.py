@@ -1,12 +1,19 @@
-import json
-
+from django.http import FileResponse, Http404, JsonResponse
 from django.shortcuts import render, get_object_or_404
-from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
-from django.db.models import Subquery, OuterRef
+from django.core.files.storage import default_storage
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import etag
 
+from pricing.history import (
+    DEFAULT_POINTS, MAX_POINTS, MIN_POINTS, parse_time, price_history
+)
 from pricing.models import Price
 
 from .models import Product, Category, Variant
+from .pagecache import cache_page
+from .pagination import KeysetPaginator
+
+IMAGE_MAX_AGE = 365 * 24 * 60 * 60
 
 def category_all(request):
     categories = Category.objects.filter(parent=None)
@@ -14,50 +21,23 @@ def category_all(request):
         'categories': categories
     })
 
+@cache_page(lambda slug: ['category:%s' % slug])
 def category(request, slug):
     category = get_object_or_404(Category, slug=slug)
 
-    image = Variant.objects.filter(product_id=OuterRef('pk'))
-    new = Price.objects.filter(
-        listing__variant__product=OuterRef('pk'), is_current=True,
-        condition='new'
-    ).order_by('total')
-    used = Price.objects.filter(
-        listing__variant__product=OuterRef('pk'), is_current=True,
-        condition='used'
-    ).order_by('total')
-    refurb = Price.objects.filter(
-        listing__variant__product=OuterRef('pk'), is_current=True,
-        condition='refurb'
-    ).order_by('total')
-
     products = Product.objects.filter(
         category__in=category.get_descendants(include_self=True)
-    ).order_by('rank').annotate(
-        image=Subquery(image.values('image')[:1]),
-
-        new_price=Subquery(new.values('price')[:1]),
-        used_price=Subquery(used.values('price')[:1]),
-        refurb_price=Subquery(refurb.values('price')[:1]),
-
-        new_shipping=Subquery(new.values('shipping_type')[:1]),
-        used_shipping=Subquery(used.values('shipping_type')[:1]),
-        refurb_shipping=Subquery(refurb.values('shipping_type')[:1]),
     )
-    page = request.GET.get('page', 1)
 
-    paginator = Paginator(products, 50)
-    try:
-        products = paginator.page(page)
-    except PageNotAnInteger:
-        products = paginator.page(1)
-    except EmptyPage:
-        products = paginator.page(paginator.num_pages)
+    paginator = KeysetPaginator(products, 50, (('rank', False), ('pk', False)))
+    products = paginator.page(request.GET.get('cursor'))
+    products.object_list = Product.objects.cards(products.object_list)
 
     return render(request, 'products/category.html', {
         'category': category, 'products': products
     })
 
+@cache_page(lambda slug: ['product:%s' % slug])
 def product(request, slug):
     product = get_object_or_404(Product, slug=slug)
     variants = Variant.objects.filter(product=product)
@@ -69,40 +49,48 @@ def product(request, slug):
         'variant_prices': variant_prices
     })
 
+@cache_page(lambda product, variant: ['product:%s' % product])
 def variant(request, product, variant):
     variant = get_object_or_404(Variant, product__slug=product, slug=variant)
     current_prices = Price.objects.filter(
         listing__variant=variant, is_current=True
     ).exclude(seller='').order_by('condition', 'total')
-    retailers = ('amazon',)
-    conditions = ('new', 'refurb', 'used')
-    colors = {'amazon': '18, 52, 86'}
-    opacities = {'new': 1, 'refurb': .67, 'used': .33}
-    all_prices = Price.objects.filter(listing__variant=variant).order_by('time')
-    price_history = []
-    for retailer in retailers:
-        main_color = colors[retailer]
-        for condition in conditions:
-            opacity = opacities[condition]
-            color = 'rgba(%s, %s)' % (main_color, opacity)
-            label = '%s (%s)' % (retailer.title(), condition)
-            data = [{
-                'x': price.time.isoformat(),
-                'y': float(price.total) if price.total else None
-            } for price in all_prices.filter(
-                listing__retailer=retailer, condition=condition
-            )]
-            price_history.append({
-                'label': label, 'data': data, 'borderColor': color,
-                'backgroundColor': color, 'fill': False, 'steppedLine': True
-            })
+    all_prices = Price.objects.filter(listing__variant=variant)
     low_prices = []
-    for condition in conditions:
+    for condition in ('new', 'refurb', 'used'):
         low_prices.append(
             all_prices.filter(condition=condition).exclude(
                 total=None).order_by('total', '-time').first()
         )
     return render(request, 'products/variant.html', {
-        'variant': variant, 'current_prices': current_prices, 'price_history':
-        json.dumps(price_history), 'low_prices': low_prices
+        'variant': variant, 'current_prices': current_prices,
+        'low_prices': low_prices
     })
+
+@cache_page(lambda product, variant: ['product:%s' % product])
+def variant_history(request, product, variant):
+    variant = get_object_or_404(Variant, product__slug=product, slug=variant)
+    try:
+        start = parse_time(request.GET.get('start'))
+        end = parse_time(request.GET.get('end'))
+        points = int(request.GET.get('points', DEFAULT_POINTS))
+    except ValueError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+    points = min(max(points, MIN_POINTS), MAX_POINTS)
+    return JsonResponse({
+        'datasets': price_history(variant, start, end, points)
+    })
+
+@etag(lambda request, name: name)
+def image(request, name):
+    # Image names are derived from their content, so a name always refers to
+    # the same image and browsers may cache it forever.
+    try:
+        source = default_storage.open(name)
+    except FileNotFoundError:
+        raise Http404
+    response = FileResponse(source, content_type='image/jpeg')
+    patch_cache_control(
+        response, public=True, max_age=IMAGE_MAX_AGE, immutable=True
+    )
+    return response
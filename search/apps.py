@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class SearchConfig(AppConfig):
     name = 'search'
+
+    def ready(self):
+        # Keep the suggestion index in step with saved names.
+        from . import suggest  # noqa: F401
@@ -0,0 +1,41 @@
+import hashlib
+
+from django.core.cache import cache
+
+from products.models import SearchToken, search_terms, token_prefix
+
+COUNT_TIMEOUT = 10 * 60
+
+def count_key(query, category):
+    terms = '%s|%s' % (' '.join(search_terms(query)), category or '')
+    return 'search-results:%s' % hashlib.md5(terms.encode('utf-8')).hexdigest()
+
+def count_results(products, query, category=None, categories=None):
+    """
+    Count search results once per query and category, and reuse the count
+    for COUNT_TIMEOUT seconds. A product matches a single term query when
+    one of its tokens starts with the term, so those are counted from the
+    token index alone, without scoring the matches.
+
+    Parameters:
+        products (QuerySet): Search results
+        query (string): Words searched for
+        category (string): Slug of the category searched in, if any
+        categories (QuerySet): The category and those below it, if any
+
+    Returns:
+        int: Number of results
+    """
+    key = count_key(query, category)
+    count = cache.get(key)
+    if count is None:
+        terms = search_terms(query)
+        if len(terms) == 1:
+            tokens = SearchToken.objects.filter(token_prefix(terms[0]))
+            if categories is not None:
+                tokens = tokens.filter(product__category__in=categories)
+            count = tokens.values('product').distinct().count()
+        else:
+            count = products.count()
+        cache.set(key, count, COUNT_TIMEOUT)
+    return count
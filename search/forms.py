@@ -9,7 +9,8 @@ class SearchForm(forms.Form):
         max_length=150, widget=forms.TextInput(
             attrs={
                 'type': 'search', 'placeholder': 'Fetch the Future',
-                'minlength': 3
+                'minlength': 3, 'list': 'query-suggestions',
+                'autocomplete': 'off'
             }
         )
     )
@@ -0,0 +1,220 @@
+import time
+import bisect
+import threading
+from collections import namedtuple
+
+from django.db import connection
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from products.models import Category, Manufacturer, Product, tokenize
+
+REFRESH_INTERVAL = 15 * 60
+MIN_LENGTH = 2
+SCAN_LIMIT = 500
+
+Suggestion = namedtuple('Suggestion', ('kind', 'label', 'url', 'order'))
+
+def index_keys(label):
+    """
+    Get the keys a name is found by: the name from each of its words on, so
+    a prefix of any word finds it.
+
+    Parameters:
+        label (string): Name to index
+
+    Returns:
+        list: Lowercase keys
+    """
+    words = tokenize(label)
+    return [' '.join(words[start:]) for start in range(len(words))]
+
+def category_suggestion(category):
+    return Suggestion(
+        'category', category.name,
+        reverse('category', args=[category.slug]), (0, 0)
+    )
+
+def manufacturer_suggestion(manufacturer):
+    return Suggestion(
+        'manufacturer', manufacturer.name, '%s?%s' % (
+            reverse('search'), urlencode({'query': manufacturer.name})
+        ), (1, 0)
+    )
+
+def product_suggestion(product):
+    return Suggestion(
+        'product', str(product), reverse('product', args=[product.slug]),
+        (2, product.rank if product.rank is not None else float('inf'))
+    )
+
+class SuggestionIndex:
+    """
+    Sorted array of the names of categories, manufacturers and products, so
+    names starting with a prefix are found by a binary search without
+    touching the database. Changes saved by this process are applied as
+    they are saved; the whole index is rebuilt every refresh_interval
+    seconds to pick up changes made by other processes.
+
+    Attributes:
+        keys (list): Sorted (key, kind, pk) tuples
+        entries (dictionary): Suggestions keyed by (kind, pk)
+        built (float): Monotonic time of the last build, or None
+        refresh_interval (float): Seconds between rebuilds
+    """
+    def __init__(self, refresh_interval=REFRESH_INTERVAL):
+        """
+        Constructor for the SuggestionIndex class.
+
+        Parameters:
+            refresh_interval (float): Seconds between rebuilds
+        """
+        self.keys = []
+        self.entries = {}
+        self.built = None
+        self.refresh_interval = refresh_interval
+        self.building = False
+        self.lock = threading.Lock()
+
+    def build(self):
+        """
+        Index every category, manufacturer and product from the database.
+        """
+        entries = {}
+        for category in Category.objects.all():
+            entries['category', category.pk] = category_suggestion(category)
+        for manufacturer in Manufacturer.objects.all():
+            entries['manufacturer', manufacturer.pk] = (
+                manufacturer_suggestion(manufacturer)
+            )
+        for product in Product.objects.select_related('manufacturer'):
+            entries['product', product.pk] = product_suggestion(product)
+        keys = sorted(
+            (key, kind, pk) for (kind, pk), suggestion in entries.items()
+            for key in index_keys(suggestion.label)
+        )
+        with self.lock:
+            self.keys = keys
+            self.entries = entries
+            self.built = time.monotonic()
+
+    def refresh(self):
+        """
+        Build the index if it was never built, or start rebuilding it in the
+        background if it is due, so lookups keep being answered meanwhile.
+        """
+        with self.lock:
+            if self.built is None:
+                age = None
+            else:
+                age = time.monotonic() - self.built
+                if self.building or age < self.refresh_interval:
+                    return
+            self.building = True
+        if age is None:
+            self.rebuild()
+        else:
+            threading.Thread(
+                target=self.rebuild, args=(True,), daemon=True
+            ).start()
+
+    def rebuild(self, background=False):
+        try:
+            self.build()
+        finally:
+            self.building = False
+            if background:
+                connection.close()
+
+    def add(self, pk, suggestion):
+        """
+        Index a suggestion, replacing the one of the same object if any.
+
+        Parameters:
+            pk (int): Primary key of the object suggested
+            suggestion (Suggestion): Suggestion to index
+        """
+        with self.lock:
+            self._remove(suggestion.kind, pk)
+            self.entries[suggestion.kind, pk] = suggestion
+            for key in index_keys(suggestion.label):
+                bisect.insort(self.keys, (key, suggestion.kind, pk))
+
+    def remove(self, kind, pk):
+        """
+        Drop the suggestion of an object from the index.
+
+        Parameters:
+            kind (string): 'category', 'manufacturer' or 'product'
+            pk (int): Primary key of the object
+        """
+        with self.lock:
+            self._remove(kind, pk)
+
+    def _remove(self, kind, pk):
+        suggestion = self.entries.pop((kind, pk), None)
+        if suggestion is None:
+            return
+        for key in index_keys(suggestion.label):
+            index = bisect.bisect_left(self.keys, (key, kind, pk))
+            if index < len(self.keys) and self.keys[index] == (key, kind, pk):
+                del self.keys[index]
+
+    def lookup(self, query, limit=10):
+        """
+        Find the names with a word starting with a query, categories first,
+        then manufacturers, then products by rank.
+
+        Parameters:
+            query (string): Text typed so far
+            limit (int): Most suggestions to return
+
+        Returns:
+            list: Suggestions
+        """
+        prefix = ' '.join(tokenize(query))
+        if len(prefix) < MIN_LENGTH:
+            return []
+        self.refresh()
+        found = {}
+        with self.lock:
+            start = bisect.bisect_left(self.keys, (prefix,))
+            for key, kind, pk in self.keys[start:start + SCAN_LIMIT]:
+                if not key.startswith(prefix):
+                    break
+                found[kind, pk] = self.entries[kind, pk]
+        return sorted(found.values(), key=lambda each: each.order)[:limit]
+
+suggestions = SuggestionIndex()
+
+@receiver(post_save, sender=Category)
+def index_category(sender, instance, **kwargs):
+    if suggestions.built is not None:
+        suggestions.add(instance.pk, category_suggestion(instance))
+
+@receiver(post_save, sender=Manufacturer)
+def index_manufacturer(sender, instance, **kwargs):
+    if suggestions.built is not None:
+        suggestions.add(instance.pk, manufacturer_suggestion(instance))
+        # Product names start with their manufacturer's.
+        for product in instance.product_set.select_related('manufacturer'):
+            suggestions.add(product.pk, product_suggestion(product))
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    if suggestions.built is not None:
+        suggestions.add(instance.pk, product_suggestion(instance))
+
+@receiver(post_delete, sender=Category)
+def unindex_category(sender, instance, **kwargs):
+    suggestions.remove('category', instance.pk)
+
+@receiver(post_delete, sender=Manufacturer)
+def unindex_manufacturer(sender, instance, **kwargs):
+    suggestions.remove('manufacturer', instance.pk)
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    suggestions.remove('product', instance.pk)